@@ -1,15 +1,27 @@
 #! /usr/bin/env python3
 
 import argparse
+import functools
+import multiprocessing
 import operator
+import os
 import numpy as np
 import sys
+import warnings
 import networkx as nx
 
+from degeneracy import core_decomposition
+from graph_io import FORMATS, detect_format, read_graph as read_graph_file
+from graph_cache import load_cached_graph, write_cached_graph
+from result_cache import lookup_result, open_result_cache, store_result
+from running_stats import RunningStats, summarize
+from parallel_peeling import parallel_core_decomposition
+from semi_external import semi_external_core_numbers
+
 global _trace
 _trace = False
 
-from collections import deque
+from collections import Counter, deque
 
 # May need to change this if the graph is too large
 sys.setrecursionlimit(10000) 
@@ -23,10 +35,32 @@ def parse_arguments():
     parser.add_argument("-gl", help="Flag indicating input_file is a list of groups", action='store_true', dest="group_flag")
     parser.add_argument("-gd", help="directory containing group lists", dest="group_dir")
     parser.add_argument("--trace", help="trace dfs", action='store_true', dest="trace")
+    parser.add_argument("--cache", help="Cache parsed graphs in binary files next to the inputs", action='store_true', dest="cache")
+    parser.add_argument("--cache-dir", help="directory for the binary graph cache (implies --cache)", dest="cache_dir")
+    parser.add_argument("--jobs", help="number of worker processes: graphs are processed in parallel in list modes and a single graph is peeled in parallel (0 uses every core)", type=int, default=1, dest="jobs")
+    parser.add_argument("--stream", help="Aggregate -p/-gl statistics online in O(#keys) memory", action='store_true', dest="stream")
+    parser.add_argument("--report-every", help="print partial -p/-gl statistics to stderr every N graphs (implies --stream)", type=int, dest="report_every")
+    parser.add_argument("--checkpoint", help="append the result of every processed graph to this log", dest="checkpoint")
+    parser.add_argument("--resume", help="Skip graphs already recorded in the --checkpoint log", action='store_true', dest="resume")
+    parser.add_argument("--sync-every", help="fsync the checkpoint log every N graphs (default 100)", type=int, default=100, dest="sync_every")
+    parser.add_argument("--result-cache", help="SQLite database of per-graph results to reuse across runs", dest="result_cache")
+    parser.add_argument("--cores", help="write per-vertex core numbers, k-shell sizes and the max core of each graph to this directory (disables --result-cache)", dest="cores_dir")
+    parser.add_argument("--cores-format", help="format of the --cores output", choices=['csv', 'npz'], default='csv', dest="cores_format")
+    parser.add_argument("--semi-external", help="Compute the degeneracy of a single graph with O(V) memory by streaming input_file from disk; the file must list every edge in both directions sorted by (source, target), as text or as int64 pairs in a .bin file", action='store_true', dest="semi_external")
+    parser.add_argument("--format", help="format of the graph files (default: detected from the extension and contents)", choices=['auto'] + FORMATS, default='auto', dest="graph_format")
+    parser.add_argument("--backend", help="k-core implementation to use (networkx is kept for validation)", choices=['csr', 'networkx'], default='csr', dest="backend")
     return parser.parse_args()
 
 # Read in graph
-def read_graph(filename):
+def read_graph(filename, graph_format='auto'):
+    if graph_format == 'auto':
+        graph_format = detect_format(filename)
+    if graph_format != 'edgelist':
+        graph = read_graph_file(filename, graph_format)
+        G = nx.Graph()
+        G.add_nodes_from(graph.ids.tolist())
+        G.add_edges_from(zip(graph.ids[graph.src].tolist(), graph.ids[graph.dst].tolist()))
+        return G, graph.n, len(graph.src)
     G = nx.Graph()
     E = 0
     with open(filename) as in_file:
@@ -37,9 +71,211 @@ def read_graph(filename):
                 E += 1
     return G, len(G), E
 
-def get_k_core_number(G):
-    return max(nx.core_number(G).values())
+# Read in graph as a CSR graph with vertices relabeled to 0..V-1
+# The graph is (offsets, neighbors, ids) where ids are the original labels
+def read_csr_graph(filename, graph_format='auto'):
+    graph = read_graph_file(filename, graph_format)
+    offsets, neighbors = graph.to_csr()
+    return (offsets, neighbors, graph.ids), graph.n, len(graph.src)
+
+# Load a graph, going through the binary cache if it is enabled
+def load_graph(filename, backend, cache=False, cache_dir=None, graph_format='auto'):
+    if backend == 'networkx':
+        return read_graph(filename, graph_format)
+    if not cache:
+        return read_csr_graph(filename, graph_format)
+    graph_format = result_format(filename, graph_format)
+    cached = load_cached_graph(filename, graph_format, cache_dir)
+    if cached is not None:
+        return cached
+    graph, V, E = read_csr_graph(filename, graph_format)
+    # The run goes on without the cache, warning once
+    if not write_cached_graph(filename, graph_format, graph, V, E, cache_dir):
+        warnings.warn("could not write the graph cache, continuing without it")
+    return graph, V, E
+
+# CSR graphs use parallel peeling over jobs processes unless jobs is 1
+def csr_core_decomposition(G, jobs=1):
+    if jobs == 1:
+        return core_decomposition(G[0], G[1])
+    return parallel_core_decomposition(G[0], G[1], jobs)
+
+def get_k_core_number(G, backend='networkx', jobs=1):
+    if backend == 'networkx':
+        return max(nx.core_number(G).values())
+    return csr_core_decomposition(G, jobs)[0]
+
+def get_core_numbers(G, backend='networkx', jobs=1):
+    if backend == 'networkx':
+        return np.fromiter(nx.core_number(G).values(), dtype=np.int64, count=len(G))
+    return csr_core_decomposition(G, jobs)[1]
+
+# Original vertex labels, in the same order as get_core_numbers
+def get_vertex_ids(G, backend='networkx'):
+    if backend == 'networkx':
+        return np.array(list(G))
+    return G[2]
+
+# Write the core number of every vertex, the size of every k-shell and the
+# vertices of the maximum core. csv writes <name>.cores.csv, <name>.shells.csv
+# and <name>.maxcore.csv, npz writes all of them to <name>.cores.npz.
+def write_cores(cores_dir, name, ids, core, shells, cores_format='csv'):
+    os.makedirs(cores_dir, exist_ok=True)
+    prefix = os.path.join(cores_dir, name)
+    max_core = ids[core == len(shells) - 1]
+    if cores_format == 'npz':
+        np.savez(prefix + '.cores.npz', ids=ids, core=core, shells=shells, max_core=max_core)
+        return
+    with open(prefix + '.cores.csv', 'w') as out_file:
+        out_file.write("vertex,core\n")
+        np.savetxt(out_file, np.column_stack((ids, core)), fmt='%d', delimiter=',')
+    with open(prefix + '.shells.csv', 'w') as out_file:
+        out_file.write("k,size\n")
+        np.savetxt(out_file, np.column_stack((np.arange(len(shells)), shells)), fmt='%d', delimiter=',')
+    with open(prefix + '.maxcore.csv', 'w') as out_file:
+        out_file.write("vertex\n")
+        np.savetxt(out_file, max_core, fmt='%d')
+
+def instance_name(filename):
+    return os.path.splitext(os.path.basename(filename))[0]
+
+# Returns V, E, the degeneracy and the k-shell sizes of a graph file. With
+# cores_dir the full decomposition is written out as well.
+def process_graph(filename, backend, cache=False, cache_dir=None, cores_dir=None, cores_format='csv', graph_format='auto'):
+    graph, V, E = load_graph(filename, backend, cache, cache_dir, graph_format)
+    core = get_core_numbers(graph, backend)
+    shells = np.bincount(core)
+    if cores_dir is not None:
+        write_cores(cores_dir, instance_name(filename), get_vertex_ids(graph, backend), core, shells, cores_format)
+    return V, E, max(len(shells) - 1, 0), tuple(shells.tolist())
+
+# Process graph files in a pool of jobs workers, yielding the results of
+# process_graph in input order
+def compute_graphs(filenames, jobs=1, **options):
+    work = functools.partial(process_graph, **options)
+    if jobs == 1:
+        for filename in filenames:
+            yield work(filename)
+        return
+    jobs = jobs or os.cpu_count()
+    chunksize = max(1, len(filenames) // (jobs * 8))
+    with multiprocessing.Pool(jobs) as pool:
+        for result in pool.imap(work, filenames, chunksize):
+            yield result
+
+# Format a file is read as, part of its key in the graph and result caches
+def result_format(filename, graph_format='auto'):
+    return detect_format(filename) if graph_format == 'auto' else graph_format
+
+# Same as compute_graphs, but each distinct file is processed only once and
+# results already in the result cache are used without parsing the graph.
+# A result is only kept while its file appears again later in the list.
+def map_graphs(filenames, jobs=1, result_cache=None, **options):
+    graph_format = options.get('graph_format', 'auto')
+    remaining = Counter(filenames)
+    cached = set()
+    if result_cache is not None:
+        for filename in remaining:
+            if lookup_result(result_cache, filename, result_format(filename, graph_format)) is not None:
+                cached.add(filename)
+    todo = [f for f in remaining if f not in cached]
+    computed = compute_graphs(todo, jobs, **options)
+    results = {}
+    stored = 0
+    try:
+        for filename in filenames:
+            if filename in results:
+                result = results[filename]
+            elif filename in cached:
+                result = lookup_result(result_cache, filename, result_format(filename, graph_format))
+            else:
+                result = next(computed)
+                if result_cache is not None:
+                    store_result(result_cache, filename, result_format(filename, graph_format), result)
+                    stored += 1
+                    if stored % 100 == 0:
+                        result_cache.commit()
+            remaining[filename] -= 1
+            if remaining[filename]:
+                results[filename] = result
+            else:
+                results.pop(filename, None)
+            yield result
+    finally:
+        if result_cache is not None:
+            result_cache.commit()
 
+# Completed graphs from a checkpoint log, one "filename V E degen shells"
+# record per line. Partial records from an interrupted run are ignored.
+def read_checkpoint(filename):
+    done = {}
+    if not os.path.exists(filename):
+        return done
+    with open(filename) as log:
+        for line in log:
+            record = line.rstrip('\n').split('\t')
+            if len(record) != 5 or not line.endswith('\n'):
+                continue
+            try:
+                V, E, degen = [int(x) for x in record[1:4]]
+                shells = tuple(int(x) for x in record[4].split(',') if x)
+            except ValueError:
+                continue
+            done[record[0]] = V, E, degen, shells
+    return done
+
+# Same as map_graphs, but every result is appended to a checkpoint log
+# (fsync'd every sync_every records). With resume, graphs already in the
+# log are not processed again and their logged results are used instead.
+# As in map_graphs, results are dropped after the last use of their file.
+def map_graphs_checkpointed(filenames, jobs, checkpoint, resume=False, sync_every=100, result_cache=None, **options):
+    remaining = Counter(filenames)
+    done = read_checkpoint(checkpoint) if resume else {}
+    done = {f: result for f, result in done.items() if f in remaining}
+    todo = [f for f in remaining if f not in done]
+    results = map_graphs(todo, jobs, result_cache, **options)
+    with open(checkpoint, 'a') as log:
+        # Terminate a partial record left by an interrupted run
+        if log.tell() > 0:
+            with open(checkpoint, 'rb') as tail:
+                tail.seek(-1, os.SEEK_END)
+                if tail.read(1) != b'\n':
+                    log.write('\n')
+        pending = 0
+        try:
+            for filename in filenames:
+                remaining[filename] -= 1
+                if filename in done:
+                    result = done[filename] if remaining[filename] else done.pop(filename)
+                    yield result
+                    continue
+                result = next(results)
+                if remaining[filename]:
+                    done[filename] = result
+                V, E, degen, shells = result
+                log.write("\t".join([filename, str(V), str(E), str(degen), ",".join(str(s) for s in shells)]) + "\n")
+                pending += 1
+                if pending >= sync_every:
+                    log.flush()
+                    os.fsync(log.fileno())
+                    pending = 0
+                yield result
+        finally:
+            log.flush()
+            os.fsync(log.fileno())
+
+# Callers should iterate the returned generator to the end (put it first
+# in zip) so the final commit/fsync runs
+def run_graphs(filenames, args, options, result_cache=None):
+    if args.checkpoint:
+        return map_graphs_checkpointed(filenames, args.jobs, args.checkpoint, args.resume, args.sync_every, result_cache, **options)
+    return map_graphs(filenames, args.jobs, result_cache, **options)
+
+def read_list(filename):
+    with open(filename) as list_file:
+        return [line.strip('\n') for line in list_file]
+
+@functools.lru_cache(maxsize=None)
 def get_key(graph_name):
     graph_name = graph_name.strip('\n')
     _, v, e, layer_var, degree_var, seed, added = graph_name.strip('.txt').split('-')
@@ -47,71 +283,116 @@ def get_key(graph_name):
     key = (v, e, added, layer_var, degree_var)
     return key
 
+# Distributions are lists of values, or RunningStats in streaming mode.
+# Lists are summarized the same way, so both modes print the same numbers.
 def compute_stats(distribution):
-    return np.mean(distribution), np.std(distribution, ddof=1), np.median(distribution)
+    if not isinstance(distribution, RunningStats):
+        distribution = summarize(distribution)
+    return distribution.mean(), distribution.std(), distribution.median()
+
+def compute_range(distribution):
+    if isinstance(distribution, RunningStats):
+        return distribution.max, distribution.min
+    return max(distribution), min(distribution)
+
+def add_value(distributions, key, value, stream):
+    if key not in distributions:
+        distributions[key] = RunningStats() if stream else []
+    if stream:
+        distributions[key].add(value)
+    else:
+        distributions[key].append(value)
+
+def write_permutation_stats(results, out_file):
+    print("Instance, mean degen, std degen, median, max, min", file=out_file)
+    for instance in results:
+        stats = compute_stats(results[instance]) + compute_range(results[instance])
+        print(",".join([instance] + [str(s) for s in stats]), file=out_file)
+
+def write_group_stats(k_core_numbers, out_file):
+    header = ",".join(["V", "B", "A", "L", "D", "Mean degen", "Std degen", "Median degen"])
+    print(header, file=out_file)
+    for key in k_core_numbers:
+        key_string = ",".join([str(k) for k in key])
+        k_core_stats= compute_stats(k_core_numbers[key])
+        k_core_string = ",".join([str(s) for s in k_core_stats])
+        print(",".join([key_string, k_core_string]), file=out_file)
+
+# Print the statistics gathered so far to stderr every report_every graphs
+def report_progress(count, report_every, write_stats, distributions):
+    if report_every and count % report_every == 0:
+        print("# after {} graphs".format(count), file=sys.stderr)
+        write_stats(distributions, sys.stderr)
+        sys.stderr.flush()
 
 if __name__ == "__main__":
     args = parse_arguments()
     _trace = args.trace
+    cache = args.cache or args.cache_dir is not None
+    stream = args.stream or args.report_every is not None
+    if args.resume and not args.checkpoint:
+        sys.exit("--resume requires --checkpoint")
+    options = {'backend': args.backend, 'cache': cache, 'cache_dir': args.cache_dir,
+               'cores_dir': args.cores_dir, 'cores_format': args.cores_format,
+               'graph_format': args.graph_format}
+    # Cached results have no core numbers to write out
+    result_cache = None
+    if args.result_cache and not args.cores_dir:
+        result_cache = open_result_cache(args.result_cache)
     if args.list_flag:
         list_dir = args.list_dir
         print("Instance, V, E, degen")
-        with open(args.input_file) as input_list:
-            for line in input_list:
-                line = line.strip('\n')
-                graph, V, E = read_graph(list_dir + line)
-                k_core_number = get_k_core_number(graph)
-                print("{},{},{},{}".format(line.strip('.txt'), V, E, k_core_number))
+        instances = read_list(args.input_file)
+        results = run_graphs([list_dir + line for line in instances], args, options, result_cache)
+        for (V, E, k_core_number, _), line in zip(results, instances):
+            print("{},{},{},{}".format(line.strip('.txt'), V, E, k_core_number))
     elif args.permutation_flag:
         list_dir = args.list_dir
-        print("Instance, mean degen, std degen, median, max, min")
         results = {}
-        with open(args.input_file) as input_list:
-            for line in input_list:
-                line = line.strip('\n')
-                graph, V, E = read_graph(list_dir + line)
-                k_core_number = get_k_core_number(graph)
-                base = line.strip('.txt')[:-3]
-                if base not in results:
-                    results[base] = []
-                results[base].append(k_core_number)
-        for instance in results:
-            print("{},{},{},{},{},{}".format(instance,
-                    np.mean(results[instance]),
-                    np.std(results[instance], ddof=1),
-                    np.median(results[instance]),
-                    max(results[instance]),
-                    min(results[instance])))
+        instances = read_list(args.input_file)
+        graph_results = run_graphs([list_dir + line for line in instances], args, options, result_cache)
+        for count, ((_, _, k_core_number, _), line) in enumerate(zip(graph_results, instances), 1):
+            base = line.strip('.txt')[:-3]
+            add_value(results, base, k_core_number, stream)
+            report_progress(count, args.report_every, write_permutation_stats, results)
+        write_permutation_stats(results, sys.stdout)
     elif args.group_flag:
         group_dir = args.group_dir
         list_dir = args.list_dir
         k_core_numbers = {}
-        with open(args.input_file) as group_list:
-            for group in group_list:
-                group = group.strip("\n")
-                with open(group_dir + group) as graph_list:
-                    for graph in graph_list:
-                        graph = graph.strip('\n')
-                        G, _, _ = read_graph(list_dir + graph)
-                        key = get_key(graph)
-                        if key not in k_core_numbers:
-                            k_core_numbers[key] = []
-                        k_core_number = get_k_core_number(G)
-                        k_core_numbers[key].append(k_core_number)
-        header = ",".join(["V", "B", "A", "L", "D", "Mean degen", "Std degen", "Median degen"])
-        print(header)
-        for key in k_core_numbers:
-            key_string = ",".join([str(k) for k in key])
-            k_core_stats= compute_stats(k_core_numbers[key])
-            k_core_string = ",".join([str(s) for s in k_core_stats])
-            print(",".join([key_string, k_core_string]))
+        graphs = []
+        for group in read_list(args.input_file):
+            graphs.extend(read_list(group_dir + group))
+        results = run_graphs([list_dir + graph for graph in graphs], args, options, result_cache)
+        for count, ((_, _, k_core_number, _), graph) in enumerate(zip(results, graphs), 1):
+            add_value(k_core_numbers, get_key(graph), k_core_number, stream)
+            report_progress(count, args.report_every, write_group_stats, k_core_numbers)
+        write_group_stats(k_core_numbers, sys.stdout)
+    elif args.semi_external:
+        core, present, E = semi_external_core_numbers(args.input_file)
+        ids = np.flatnonzero(present)
+        core = core[ids]
+        shells = np.bincount(core)
+        print(len(ids))
+        print(E)
+        print("Data for {}".format(args.input_file))
+        if args.cores_dir:
+            write_cores(args.cores_dir, instance_name(args.input_file), ids, core, shells, args.cores_format)
+        print("Degeneracy {}".format(max(len(shells) - 1, 0)))
     else:
-        graph, V, E = read_graph(args.input_file)
-        print(graph)
+        graph, V, E = load_graph(args.input_file, args.backend, cache, args.cache_dir, args.graph_format)
+        if args.backend == 'networkx':
+            print(graph)
         print(V)
         print(E)
         print("Data for {}".format(args.input_file))
-        k_core_number = get_k_core_number(graph)
+        if args.cores_dir:
+            core = get_core_numbers(graph, args.backend, args.jobs)
+            shells = np.bincount(core)
+            write_cores(args.cores_dir, instance_name(args.input_file), get_vertex_ids(graph, args.backend), core, shells, args.cores_format)
+            k_core_number = max(len(shells) - 1, 0)
+        else:
+            k_core_number = get_k_core_number(graph, args.backend, args.jobs)
         print("Degeneracy {}".format(k_core_number))
 
 #  [Last modified: 2018 02 27 at 01:26:10 GMT]
@@ -0,0 +1,169 @@
+#! /usr/bin/env python3
+
+# Array based k-core decomposition.
+#
+# Graphs are stored in CSR form: `offsets` has n + 1 entries and the
+# neighbors of v are neighbors[offsets[v]:offsets[v + 1]].
+
+from collections import deque
+
+import numpy as np
+
+from edge_list import sorted_unique
+
+# Frontiers of at most this many vertices are peeled one vertex at a time,
+# below it numpy's per-call overhead costs more than the work (long paths,
+# e.g. in trees, would otherwise take one round per vertex)
+SMALL_FRONTIER = 64
+
+# Build a symmetric CSR graph from edge endpoint arrays. Self-loops and
+# duplicate edges are dropped (the same as adding them to an nx.Graph).
+# Vertex ids must already be in the range 0..n-1.
+def build_csr(src, dst, n=None):
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    if n is None:
+        n = int(max(src.max(), dst.max())) + 1 if len(src) else 0
+    mask = src != dst
+    u = np.concatenate((src[mask], dst[mask]))
+    v = np.concatenate((dst[mask], src[mask]))
+    # Sorting the packed keys orders the edges by (u, v) and puts the
+    # duplicates next to each other
+    keys = sorted_unique(u * n + v)
+    u = keys // n
+    neighbors = keys % n
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(u, minlength=n), out=offsets[1:])
+    return offsets, neighbors
+
+# Neighbors of the given vertices that are still alive, as distinct
+# vertices and the number of times each occurs
+def frontier_decrements(offsets, neighbors, alive, frontier):
+    starts = offsets[frontier]
+    lengths = offsets[frontier + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # Index of every adjacency entry of the frontier
+    shift = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    found = np.asarray(neighbors[shift + np.arange(total)], dtype=np.int64)
+    found = np.sort(found[alive[found]])
+    if len(found) == 0:
+        return found, found
+    first = np.flatnonzero(np.r_[True, found[1:] != found[:-1]])
+    return found[first], np.diff(np.r_[first, len(found)])
+
+# Removes the queued vertices of level k one at a time, queueing the
+# neighbors whose degree drops to k, until the queue is empty or longer
+# than SMALL_FRONTIER. Returns the removed vertices in order and the ones
+# still queued.
+def peel_queue(offsets, neighbors, degrees, alive, queue, k):
+    queue = deque(queue.tolist())
+    removed = []
+    while queue and len(queue) <= SMALL_FRONTIER:
+        v = queue.popleft()
+        alive[v] = False
+        removed.append(v)
+        start, end = offsets[v], offsets[v + 1]
+        if end - start > SMALL_FRONTIER:
+            found = np.asarray(neighbors[start:end], dtype=np.int64)
+            found = found[alive[found]]
+            degrees[found] -= 1
+            queue.extend(found[degrees[found] == k].tolist())
+            continue
+        for u in neighbors[start:end].tolist():
+            if alive[u]:
+                degrees[u] -= 1
+                if degrees[u] == k:
+                    queue.append(u)
+    return np.array(removed, dtype=np.int64), np.array(queue, dtype=np.int64)
+
+# Level by level k-core peeling. At level k every remaining vertex of
+# degree <= k is removed at once, its neighbors' degrees are lowered and
+# the ones that drop to k are removed next, until none is left. Every step
+# works on whole frontiers, so the CSR arrays (memory-mapped ones included)
+# are read in place and no Python code runs per edge. Returns the
+# degeneracy, the core number of every vertex and the order in which the
+# vertices were removed (a degeneracy ordering).
+def core_decomposition(offsets, neighbors):
+    n = len(offsets) - 1
+    if n == 0:
+        return 0, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    degrees = np.diff(offsets).astype(np.int64)
+    alive = np.ones(n, dtype=bool)
+    core = np.zeros(n, dtype=np.int64)
+    order = []
+    remaining = np.arange(n)
+    k = 0
+    while len(remaining):
+        frontier = remaining[degrees[remaining] <= k]
+        if len(frontier) == 0:
+            k = int(degrees[remaining].min())
+            continue
+        while len(frontier):
+            if len(frontier) <= SMALL_FRONTIER:
+                removed, frontier = peel_queue(offsets, neighbors, degrees, alive, frontier, k)
+                core[removed] = k
+                order.append(removed)
+                continue
+            core[frontier] = k
+            alive[frontier] = False
+            order.append(frontier)
+            vertices, counts = frontier_decrements(offsets, neighbors, alive, frontier)
+            degrees[vertices] -= counts
+            frontier = vertices[degrees[vertices] <= k]
+        remaining = remaining[alive[remaining]]
+        k += 1
+    return int(core.max()), core, np.concatenate(order)
+
+# Batagelj-Zaversnik O(V + E) core decomposition using a bucket queue, kept
+# as a reference for core_decomposition. It copies the CSR arrays into
+# Python lists and loops over every edge, so it is much slower and uses
+# several times the memory of the graph.
+def bucket_core_decomposition(offsets, neighbors):
+    n = len(offsets) - 1
+    if n == 0:
+        return 0, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    degrees = np.diff(offsets)
+    # vert holds the vertices sorted by degree, pos is its inverse and
+    # bucket[d] is the index in vert where the vertices of degree d start
+    vert = np.argsort(degrees, kind='stable')
+    pos = np.empty(n, dtype=np.int64)
+    pos[vert] = np.arange(n)
+    bucket = np.zeros(degrees.max() + 1, dtype=np.int64)
+    np.cumsum(np.bincount(degrees)[:-1], out=bucket[1:])
+
+    # Plain lists are much faster than numpy arrays for scalar access
+    deg = degrees.tolist()
+    vert = vert.tolist()
+    pos = pos.tolist()
+    bucket = bucket.tolist()
+    offs = offsets.tolist()
+    nbrs = neighbors.tolist()
+
+    for i in range(n):
+        v = vert[i]
+        dv = deg[v]
+        for j in range(offs[v], offs[v + 1]):
+            u = nbrs[j]
+            du = deg[u]
+            if du > dv:
+                # Move u to the front of its bucket and shrink the bucket
+                pu = pos[u]
+                pw = bucket[du]
+                w = vert[pw]
+                if u != w:
+                    pos[u] = pw
+                    vert[pu] = w
+                    pos[w] = pu
+                    vert[pw] = u
+                bucket[du] += 1
+                deg[u] = du - 1
+
+    core = np.array(deg, dtype=np.int64)
+    return int(core.max()), core, np.array(vert, dtype=np.int64)
+
+def degeneracy(offsets, neighbors):
+    return core_decomposition(offsets, neighbors)[0]
@@ -1,41 +1,134 @@
 #! /usr/bin/env python3
 
 import argparse
+import shutil
+import sys
+import tempfile
+import numpy as np
+
+from edge_list import CHUNK_SIZE, iter_edge_chunks, read_edge_list, sorted_unique
+from external_sort import RunSpiller
 
 def parse_arguments():
     parser = argparse.ArgumentParser()
     parser.add_argument("input_file", help="input file of graph")
+    parser.add_argument("-o", help="write the output to this file instead of stdout", dest="output_file")
+    parser.add_argument("--external", help="Canonicalize and deduplicate with an external sort, for edge lists larger than memory (the output lists every edge once, as 'min max')", action='store_true', dest="external")
+    parser.add_argument("--mem", help="memory budget in MB for --external (default 1024)", type=int, default=1024, dest="mem")
+    parser.add_argument("--bulk", help="Find duplicate edges by sorting the whole edge list with numpy", action='store_true', dest="bulk")
     return parser.parse_args()
 
-# Read in graph
-def read_graph(filename):
-    adj = {}
-    E = 0
-    lines = []
+def write_header(out_file, filename, V, E):
+    out_file.write("# directed version of {}\n\n".format(filename))
+    out_file.write("# undirected stats:\nn = {}, m = {}\n\n".format(V, E))
+
+# Copy the non-empty lines of the input, repeating the first occurrence of
+# every edge. new_edge[i] says whether the i-th edge is a first occurrence.
+def write_lines(filename, out_file, new_edge):
+    edge_index = 0
     with open(filename) as in_file:
         for line in in_file:
             line = line.strip('\n')
             if '#' not in line and len(line) > 1:
-                edge = [int(v) for v in line.split()]
-                if edge[0] not in adj:
-                    adj[edge[0]] = []
-                if edge[1] not in adj:
-                    adj[edge[1]] = []
-                if edge[0] != edge[1]:
-                    if edge[1] not in adj[edge[0]]:
-                        adj[edge[0]].append(edge[1])
-                        adj[edge[1]].append(edge[0])
-                        E += 1
-                        lines.append(line)
+                if new_edge[edge_index]:
+                    out_file.write(line + '\n')
+                edge_index += 1
             if len(line) > 1:
-                lines.append(line)
-    return lines, len(adj), E
+                out_file.write(line + '\n')
+
+# Single pass: duplicates are found with a set of (min, max) pairs. Only
+# the first two fields of a line are the edge, the rest (e.g. a weight) is
+# copied as is. The body is spooled to a temporary file since the header needs n and m.
+def convert_streaming(filename, out_file):
+    vertices = set()
+    edges = set()
+    with tempfile.TemporaryFile('w+') as body:
+        with open(filename) as in_file:
+            for line in in_file:
+                line = line.strip('\n')
+                if '#' not in line and len(line) > 1:
+                    fields = line.split()
+                    u, v = int(fields[0]), int(fields[1])
+                    vertices.add(u)
+                    vertices.add(v)
+                    if u != v:
+                        key = (u, v) if u < v else (v, u)
+                        if key not in edges:
+                            edges.add(key)
+                            body.write(line + '\n')
+                if len(line) > 1:
+                    body.write(line + '\n')
+        write_header(out_file, filename, len(vertices), len(edges))
+        body.seek(0)
+        shutil.copyfileobj(body, out_file)
+
+# The first occurrence of every edge, found by sorting the (min, max) pairs
+# of the whole edge list. Self-loops are never new.
+def find_new_edges(filename):
+    src, dst = read_edge_list(filename, usecols=(0, 1))
+    V = len(sorted_unique(np.concatenate((src, dst))))
+    edge_ids = np.flatnonzero(src != dst)
+    u = np.minimum(src[edge_ids], dst[edge_ids])
+    v = np.maximum(src[edge_ids], dst[edge_ids])
+    # The sort is stable, so the first pair of every run is the first occurrence
+    order = np.lexsort((v, u))
+    u, v = u[order], v[order]
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+    first = order[starts]
+    new_edge = np.zeros(len(src), dtype=bool)
+    new_edge[edge_ids[first]] = True
+    return new_edge, V, len(first)
+
+def convert_bulk(filename, out_file):
+    new_edge, V, E = find_new_edges(filename)
+    write_header(out_file, filename, V, E)
+    write_lines(filename, out_file, new_edge)
+
+# External memory: every edge is canonicalized to (min, max), self-loops
+# are dropped and the packed edges and the vertex ids are sorted in runs
+# spilled to temp files, then merged without duplicates. Memory use is
+# about mem_bytes. The output lists each edge once as "u v", sorted.
+def convert_external(filename, out_file, mem_bytes):
+    # Half of the budget for each of the two run buffers, each value being
+    # copied about twice while a run is sorted
+    max_items = mem_bytes // 2 // 8 // 3
+    chunk_size = min(CHUNK_SIZE, max(1, mem_bytes // 8))
+    with tempfile.TemporaryDirectory() as directory:
+        edge_runs = RunSpiller(directory, 'edges', np.uint64, max_items)
+        vertex_runs = RunSpiller(directory, 'vertices', np.int64, max_items)
+        for src, dst in iter_edge_chunks(filename, chunk_size, usecols=(0, 1)):
+            vertex_runs.add(src)
+            vertex_runs.add(dst)
+            if len(src) and (min(src.min(), dst.min()) < 0 or max(src.max(), dst.max()) >= 2**32):
+                raise ValueError("vertex ids must be in [0, 2^32) in external mode")
+            loops = src == dst
+            u = np.minimum(src[~loops], dst[~loops]).astype(np.uint64)
+            v = np.maximum(src[~loops], dst[~loops]).astype(np.uint64)
+            edge_runs.add((u << np.uint64(32)) | v)
+
+        V = sum(len(block) for block in vertex_runs.merged(max_items))
+        with tempfile.TemporaryFile('w+') as body:
+            E = 0
+            for keys in edge_runs.merged(max_items):
+                E += len(keys)
+                edges = np.column_stack((keys >> np.uint64(32), keys & np.uint64(0xffffffff)))
+                np.savetxt(body, edges, fmt='%d')
+            write_header(out_file, filename, V, E)
+            body.seek(0)
+            shutil.copyfileobj(body, out_file)
 
 if __name__ == "__main__":
     args = parse_arguments()
-    lines, V, E = read_graph(args.input_file)
-    print("# directed version of {}\n".format(args.input_file))
-    print("# undirected stats:\nn = {}, m = {}\n".format(V, E))
-    for line in lines:
-        print(line)
+    out_file = open(args.output_file, 'w') if args.output_file else sys.stdout
+    try:
+        if args.external:
+            convert_external(args.input_file, out_file, args.mem << 20)
+        elif args.bulk:
+            convert_bulk(args.input_file, out_file)
+        else:
+            convert_streaming(args.input_file, out_file)
+    finally:
+        if args.output_file:
+            out_file.close()
 #  [Last modified: 2018 02 27 at 01:26:10 GMT]
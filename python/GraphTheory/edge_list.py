@@ -0,0 +1,88 @@
+#! /usr/bin/env python3
+
+# Bulk reader for whitespace separated edge lists ("u v" per line).
+#
+# Any line containing '#' is treated as a comment, the same as the old
+# per-line readers. The file is read in large blocks and each block is
+# parsed by numpy's C reader in a single call.
+
+import io
+import numpy as np
+
+CHUNK_SIZE = 1 << 24
+
+# Remove every line containing marker from a block of text
+def strip_comments(block, marker=b'#'):
+    pieces = []
+    start = 0
+    marker_pos = block.find(marker)
+    while marker_pos != -1:
+        line_start = block.rfind(b'\n', start, marker_pos) + 1
+        line_end = block.find(b'\n', marker_pos)
+        line_end = len(block) if line_end == -1 else line_end + 1
+        pieces.append(block[start:line_start])
+        start = line_end
+        marker_pos = block.find(marker, start)
+    pieces.append(block[start:])
+    return b''.join(pieces)
+
+# Yield the contents of a file in blocks of about chunk_size bytes that
+# always end at a line boundary
+def iter_line_blocks(filename, chunk_size=CHUNK_SIZE):
+    with open(filename, 'rb') as in_file:
+        tail = b''
+        while True:
+            block = in_file.read(chunk_size)
+            if not block:
+                if tail:
+                    yield tail
+                return
+            # Only whole lines are returned, the rest is kept for the next block
+            block = tail + block
+            cut = block.rfind(b'\n') + 1
+            block, tail = block[:cut], block[cut:]
+            if block:
+                yield block
+
+# Yield the edges of a file as (src, dst) arrays, one pair per block. With
+# usecols=(0, 1) only the first two fields of every line are read, so
+# weighted edge lists can be read too.
+def iter_edge_chunks(filename, chunk_size=CHUNK_SIZE, usecols=None):
+    for block in iter_line_blocks(filename, chunk_size):
+        if b'#' in block:
+            block = strip_comments(block)
+        if not block or block.isspace():
+            continue
+        edges = np.loadtxt(io.BytesIO(block), dtype=np.int64, ndmin=2, usecols=usecols)
+        if edges.shape[1] != 2:
+            raise ValueError("{} is not an edge list ({} columns)".format(filename, edges.shape[1]))
+        yield np.ascontiguousarray(edges[:, 0]), np.ascontiguousarray(edges[:, 1])
+
+# Sorted distinct values of an array (a plain sort is faster than np.unique)
+def sorted_unique(values):
+    values = np.sort(values)
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return values[keep]
+
+# Map sparse vertex ids to 0..n-1. Returns the original ids (sorted) and
+# the relabeled endpoint arrays.
+def relabel(src, dst):
+    ids = sorted_unique(np.concatenate((src, dst)))
+    return ids, np.searchsorted(ids, src), np.searchsorted(ids, dst)
+
+# Read a whole edge list into contiguous int64 arrays. With relabel=True
+# the vertices are renumbered to 0..n-1 and the original ids are also
+# returned as (src, dst, ids).
+def read_edge_list(filename, relabel_ids=False, chunk_size=CHUNK_SIZE, usecols=None):
+    chunks = list(iter_edge_chunks(filename, chunk_size, usecols))
+    if chunks:
+        src = np.concatenate([c[0] for c in chunks])
+        dst = np.concatenate([c[1] for c in chunks])
+    else:
+        src = np.zeros(0, dtype=np.int64)
+        dst = np.zeros(0, dtype=np.int64)
+    if relabel_ids:
+        ids, src, dst = relabel(src, dst)
+        return src, dst, ids
+    return src, dst
@@ -0,0 +1,94 @@
+#! /usr/bin/env python3
+
+# External-memory sort with duplicate elimination for 1-D integer arrays.
+#
+# Values are collected into runs of bounded size, each run is sorted,
+# deduplicated and spilled to a binary temp file, and the runs are merged
+# back block by block. A merge step emits everything up to the smallest
+# last value buffered from any run, which is known to be complete, so the
+# merge itself is vectorized instead of going through a per-value heap.
+# At most MAX_FAN_IN runs are open at once: with more runs, groups of them
+# are first merged into longer runs, as many passes as needed.
+
+import os
+import numpy as np
+
+from edge_list import sorted_unique
+
+MAX_FAN_IN = 64
+
+class RunSpiller:
+    def __init__(self, directory, name, dtype, max_items):
+        self.directory = directory
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.max_items = max(1, max_items)
+        self.pending = []
+        self.pending_items = 0
+        self.runs = []
+
+    def add(self, values):
+        self.pending.append(np.asarray(values, dtype=self.dtype))
+        self.pending_items += len(values)
+        if self.pending_items >= self.max_items:
+            self.spill()
+
+    def spill(self):
+        if not self.pending_items:
+            return
+        values = sorted_unique(np.concatenate(self.pending))
+        path = os.path.join(self.directory, "{}.{}.run".format(self.name, len(self.runs)))
+        values.tofile(path)
+        self.runs.append(path)
+        self.pending = []
+        self.pending_items = 0
+
+    # Merge groups of fan_in runs into single runs until at most fan_in are
+    # left. The merged runs are deleted.
+    def cascade(self, block_items, fan_in=MAX_FAN_IN):
+        fan_in = max(2, fan_in)
+        level = 0
+        while len(self.runs) > fan_in:
+            level += 1
+            runs = []
+            for start in range(0, len(self.runs), fan_in):
+                group = self.runs[start:start + fan_in]
+                if len(group) == 1:
+                    runs.extend(group)
+                    continue
+                path = os.path.join(self.directory, "{}.{}.{}.run".format(self.name, level, len(runs)))
+                with open(path, 'wb') as out_file:
+                    for block in merge_runs(group, self.dtype, block_items):
+                        block.tofile(out_file)
+                for merged_path in group:
+                    os.unlink(merged_path)
+                runs.append(path)
+            self.runs = runs
+
+    # Sorted distinct values of everything added, in blocks
+    def merged(self, block_items):
+        self.spill()
+        self.cascade(block_items)
+        return merge_runs(self.runs, self.dtype, block_items)
+
+def merge_runs(runs, dtype, block_items):
+    files = [open(path, 'rb') for path in runs]
+    try:
+        per_run = max(1, block_items // max(1, len(files)))
+        buffers = [np.fromfile(f, dtype=dtype, count=per_run) for f in files]
+        while True:
+            live = [i for i in range(len(files)) if len(buffers[i])]
+            if not live:
+                break
+            bound = min(buffers[i][-1] for i in live)
+            parts = []
+            for i in live:
+                cut = np.searchsorted(buffers[i], bound, side='right')
+                parts.append(buffers[i][:cut])
+                buffers[i] = buffers[i][cut:]
+                if len(buffers[i]) == 0:
+                    buffers[i] = np.fromfile(files[i], dtype=dtype, count=per_run)
+            yield sorted_unique(np.concatenate(parts))
+    finally:
+        for f in files:
+            f.close()
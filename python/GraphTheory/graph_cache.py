@@ -0,0 +1,105 @@
+#! /usr/bin/env python3
+
+# Binary cache of parsed graphs.
+#
+# A cache file is a header of HEADER_SIZE int64 values followed by the CSR
+# arrays and the original vertex ids:
+#
+#   magic, version, source mtime (ns), source size, n, nnz, V, E,
+#   neighbor itemsize, format
+#   offsets   int64[n + 1]
+#   neighbors int32/int64[nnz]
+#   ids       int64[n]
+#
+# format is the index in graph_io.FORMATS of the format the source was read
+# as. The cache is reused as long as the mtime and size of the source file
+# and the format match the header, so reading a file as another format
+# parses it again. Arrays are opened with np.memmap so reloading costs
+# almost nothing and processes reading the same file share pages.
+
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+from graph_io import FORMATS
+
+MAGIC = int.from_bytes(b'CSRGRAPH', 'little')
+VERSION = 2
+HEADER_SIZE = 10
+
+# Cache file for a graph: next to the source file, or in cache_dir under
+# a name derived from the absolute path of the source
+def cache_path(filename, cache_dir=None):
+    if cache_dir is None:
+        return filename + '.csr'
+    digest = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()
+    return os.path.join(cache_dir, digest + '.csr')
+
+def source_stamp(filename):
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+def map_array(path, dtype, offset, count):
+    # np.memmap refuses empty arrays
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+# Returns ((offsets, neighbors, ids), V, E) or None if there is no valid
+# cache for filename read as graph_format
+def load_cached_graph(filename, graph_format, cache_dir=None):
+    path = cache_path(filename, cache_dir)
+    try:
+        if os.path.getsize(path) < HEADER_SIZE * 8:
+            return None
+        header = np.fromfile(path, dtype=np.int64, count=HEADER_SIZE)
+    except OSError:
+        return None
+    magic, version, mtime, size, n, nnz, V, E, itemsize, format_index = header.tolist()
+    if magic != MAGIC or version != VERSION or (mtime, size) != source_stamp(filename):
+        return None
+    if format_index != FORMATS.index(graph_format):
+        return None
+
+    offset = HEADER_SIZE * 8
+    offsets = map_array(path, np.int64, offset, n + 1)
+    offset += (n + 1) * 8
+    neighbors = map_array(path, np.int32 if itemsize == 4 else np.int64, offset, nnz)
+    offset += nnz * itemsize
+    ids = map_array(path, np.int64, offset, n)
+    return (offsets, neighbors, ids), V, E
+
+# Write the cache for filename read as graph_format. The file is written under a temporary name
+# and renamed so concurrent readers never see a partial cache. Returns False
+# if the cache could not be written (e.g. next to a read-only input).
+def write_cached_graph(filename, graph_format, graph, V, E, cache_dir=None):
+    offsets, neighbors, ids = graph
+    n = len(offsets) - 1
+    neighbor_type = np.int32 if n < 2**31 else np.int64
+    mtime, size = source_stamp(filename)
+    header = np.array([MAGIC, VERSION, mtime, size, n, len(neighbors), V, E,
+                       np.dtype(neighbor_type).itemsize, FORMATS.index(graph_format)], dtype=np.int64)
+
+    path = cache_path(filename, cache_dir)
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, 'wb') as out_file:
+            header.tofile(out_file)
+            np.asarray(offsets, dtype=np.int64).tofile(out_file)
+            np.asarray(neighbors, dtype=neighbor_type).tofile(out_file)
+            np.asarray(ids, dtype=np.int64).tofile(out_file)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except OSError:
+        os.unlink(temp_path)
+        return False
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return True
@@ -0,0 +1,200 @@
+#! /usr/bin/env python3
+
+# Readers for the graph formats used by our datasets, all returning a Graph.
+#
+#   edgelist  whitespace separated "u v" lines, '#' comments
+#   mst       "n key x y" vertex records and "e u v weight" edge records
+#   metis     METIS/Chaco adjacency files, '%' comments, 1-based vertices
+#   mtx       Matrix Market coordinate files, 1-based indices
+#
+# Files are read in line-aligned blocks and every block is parsed with numpy
+# instead of line by line. read_graph picks the reader from the extension or,
+# failing that, from the first lines of the file.
+
+import io
+import os
+import re
+import numpy as np
+
+from degeneracy import build_csr
+from edge_list import CHUNK_SIZE, iter_line_blocks, read_edge_list, sorted_unique, strip_comments
+
+FORMATS = ['edgelist', 'mst', 'metis', 'mtx']
+
+EXTENSIONS = {'.mtx': 'mtx', '.graph': 'metis', '.metis': 'metis', '.mst': 'mst'}
+
+# An edge list over vertices 0..n-1. ids[i] is the original label of vertex
+# i, pos is an (n, 2) array of coordinates (NaN where a vertex has none) and
+# weights holds one value per edge, or either is None when the file has none.
+class Graph:
+    def __init__(self, src, dst, ids, pos=None, weights=None):
+        self.src = src
+        self.dst = dst
+        self.ids = ids
+        self.pos = pos
+        self.weights = weights
+        self.n = len(ids)
+
+    # (offsets, neighbors) without self-loops and duplicate edges
+    def to_csr(self):
+        return build_csr(self.src, self.dst, self.n)
+
+def read_edgelist_graph(filename, chunk_size=CHUNK_SIZE):
+    src, dst, ids = read_edge_list(filename, relabel_ids=True, chunk_size=chunk_size)
+    return Graph(src, dst, ids)
+
+MST_RECORD = re.compile(rb'^[ne]\s', re.M)
+
+def read_mst_graph(filename, chunk_size=CHUNK_SIZE):
+    keys, xy, edges, weights = [], [], [], []
+    for block in iter_line_blocks(filename, chunk_size):
+        # Drop any line that is not an n or e record
+        if len(MST_RECORD.findall(block)) != block.count(b'\n') + (not block.endswith(b'\n')):
+            block = b''.join(line for line in block.splitlines(True) if MST_RECORD.match(line))
+        if not block or block.isspace():
+            continue
+        records = np.loadtxt(io.BytesIO(block), dtype=str, ndmin=2)
+        if records.shape[1] != 4:
+            raise ValueError("{} is not an mst file ({} columns)".format(filename, records.shape[1]))
+        nodes = records[:, 0] == 'n'
+        keys.append(records[nodes, 1].astype(np.int64))
+        xy.append(records[nodes, 2:].astype(float))
+        edges.append(records[~nodes, 1:3].astype(np.int64))
+        weights.append(records[~nodes, 3].astype(float))
+    keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+    xy = np.concatenate(xy) if xy else np.zeros((0, 2))
+    edges = np.concatenate(edges) if edges else np.zeros((0, 2), dtype=np.int64)
+    weights = np.concatenate(weights) if weights else np.zeros(0)
+
+    # Vertices are every key of an n record plus any edge endpoint without one
+    ids = sorted_unique(np.concatenate((keys, edges.ravel())))
+    pos = np.full((len(ids), 2), np.nan)
+    pos[np.searchsorted(ids, keys)] = xy
+    src = np.searchsorted(ids, edges[:, 0])
+    dst = np.searchsorted(ids, edges[:, 1])
+    return Graph(src, dst, ids, pos, weights)
+
+# Values of the whitespace separated tokens of a block and the index of the
+# line each token is on
+def tokens_with_lines(block):
+    data = np.frombuffer(block, dtype=np.uint8)
+    space = (data == ord(' ')) | (data == ord('\t')) | (data == ord('\n')) | (data == ord('\r'))
+    starts = np.flatnonzero(~space & np.r_[True, space[:-1]])
+    lines = np.cumsum(data == ord('\n'))[starts]
+    values = np.array(block.split(), dtype=float)
+    return values, lines
+
+def read_metis_graph(filename, chunk_size=CHUNK_SIZE):
+    header = None
+    vertex = 0
+    src, dst, weights = [], [], []
+    for block in iter_line_blocks(filename, chunk_size):
+        if b'%' in block:
+            block = strip_comments(block, b'%')
+        if header is None:
+            if not block or block.isspace():
+                continue
+            block = block.lstrip()
+            line_end = block.find(b'\n')
+            line_end = len(block) if line_end < 0 else line_end
+            header = block[:line_end].split()
+            block = block[line_end + 1:]
+            n = int(header[0])
+            # fmt is up to three flags: vertex sizes, vertex weights, edge weights
+            fmt = header[2].decode().zfill(3) if len(header) > 2 else '000'
+            ncon = int(header[3]) if len(header) > 3 else 1
+            lead = (fmt[0] == '1') + (fmt[1] == '1') * ncon
+            edge_weights = fmt[2] == '1'
+        if not block:
+            continue
+        values, lines = tokens_with_lines(block)
+        # Position of every token in its line, skipping the leading vertex fields
+        index = np.arange(len(values))
+        first = np.r_[True, lines[1:] != lines[:-1]]
+        position = index - np.maximum.accumulate(np.where(first, index, 0)) - lead
+        step = 2 if edge_weights else 1
+        neighbor = (position >= 0) & (position % step == 0)
+        u = vertex + lines[neighbor]
+        v = values[neighbor].astype(np.int64) - 1
+        # Every edge is listed by both endpoints, keep it once
+        keep = u <= v
+        src.append(u[keep])
+        dst.append(v[keep])
+        if edge_weights:
+            weights.append(values[np.flatnonzero(neighbor)[keep] + 1])
+        vertex += block.count(b'\n') + (not block.endswith(b'\n'))
+    if header is None:
+        raise ValueError("{} has no METIS header".format(filename))
+    src = np.concatenate(src) if src else np.zeros(0, dtype=np.int64)
+    dst = np.concatenate(dst) if dst else np.zeros(0, dtype=np.int64)
+    if len(src) and max(src.max(), dst.max()) >= n:
+        raise ValueError("{} has edges to vertices beyond n = {}".format(filename, n))
+    weights = np.concatenate(weights) if edge_weights and weights else None
+    return Graph(src, dst, np.arange(1, n + 1), weights=weights)
+
+def read_mtx_graph(filename, chunk_size=CHUNK_SIZE):
+    with open(filename, 'rb') as in_file:
+        banner = in_file.readline().split()
+    if banner[:3] != [b'%%MatrixMarket', b'matrix', b'coordinate']:
+        raise ValueError("{} is not a Matrix Market coordinate file".format(filename))
+    if banner[3:4] == [b'complex']:
+        raise ValueError("complex Matrix Market files are not supported")
+    size = None
+    rows, cols, values = [], [], []
+    for block in iter_line_blocks(filename, chunk_size):
+        if b'%' in block:
+            block = strip_comments(block, b'%')
+        if not block or block.isspace():
+            continue
+        if size is None:
+            block = block.lstrip()
+            line_end = block.find(b'\n')
+            line_end = len(block) if line_end < 0 else line_end
+            size = [int(x) for x in block[:line_end].split()]
+            block = block[line_end + 1:]
+            if not block or block.isspace():
+                continue
+        entries = np.loadtxt(io.BytesIO(block), dtype=float, ndmin=2)
+        rows.append(entries[:, 0].astype(np.int64) - 1)
+        cols.append(entries[:, 1].astype(np.int64) - 1)
+        if entries.shape[1] > 2:
+            values.append(entries[:, 2])
+    if size is None:
+        raise ValueError("{} has no Matrix Market size line".format(filename))
+    n = max(size[0], size[1])
+    src = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    dst = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    weights = np.concatenate(values) if values else None
+    return Graph(src, dst, np.arange(1, n + 1), weights=weights)
+
+READERS = {'edgelist': read_edgelist_graph, 'mst': read_mst_graph,
+           'metis': read_metis_graph, 'mtx': read_mtx_graph}
+
+# Format of a file from its extension, else from its first lines
+def detect_format(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+    with open(filename, 'rb') as in_file:
+        head = in_file.read(1 << 16)
+    if head.startswith(b'%%MatrixMarket'):
+        return 'mtx'
+    for line in head.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(b'%'):
+            return 'metis'
+        if line.startswith(b'#'):
+            continue
+        if MST_RECORD.match(line + b' '):
+            return 'mst'
+        break
+    return 'edgelist'
+
+def read_graph(filename, graph_format=None, chunk_size=CHUNK_SIZE):
+    if graph_format is None or graph_format == 'auto':
+        graph_format = detect_format(filename)
+    if graph_format not in READERS:
+        raise ValueError("Graph format '{}' is not supported".format(graph_format))
+    return READERS[graph_format](filename, chunk_size)
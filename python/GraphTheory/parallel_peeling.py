@@ -0,0 +1,125 @@
+#! /usr/bin/env python3
+
+# Level-synchronous parallel k-core peeling (ParK/PKC style).
+#
+# At level k every remaining vertex with degree <= k is removed at once,
+# its neighbors' degrees are lowered and the newly qualifying vertices
+# form the next frontier, until no vertex of degree <= k is left. The
+# expensive part, gathering the adjacency of the frontier, is split over
+# a pool of workers that read the CSR arrays from shared memory (or from
+# the same memory-mapped cache file) and return the decrements as
+# (vertex, count) pairs. The core numbers are the same as the serial
+# engine in degeneracy.py.
+
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+
+from degeneracy import frontier_decrements
+from edge_list import sorted_unique
+
+# Below this many adjacency entries a frontier is handled without the pool
+MIN_PARALLEL_WORK = 1 << 16
+
+# Arrays attached by each worker process
+_shared = {}
+
+# Describe an array so another process can attach to it. Memory-mapped
+# arrays are reopened from their file, anything else is copied into a
+# shared memory block (returned so the caller can release it).
+def share_array(array):
+    if isinstance(array, np.memmap) and array.filename is not None:
+        return ('file', array.filename, array.dtype.str, array.offset, array.shape), None
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return ('shm', block.name, array.dtype.str, 0, array.shape), block
+
+def attach_array(spec):
+    kind, name, dtype, offset, shape = spec
+    if kind == 'file':
+        return np.memmap(name, dtype=dtype, mode='r', offset=offset, shape=shape), None
+    block = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf), block
+
+def init_worker(specs):
+    for key, spec in specs.items():
+        _shared[key] = attach_array(spec)
+
+def worker_decrements(bounds):
+    start, end = bounds
+    frontier = _shared['frontier'][0][start:end]
+    return frontier_decrements(_shared['offsets'][0], _shared['neighbors'][0], _shared['alive'][0], frontier)
+
+# Same results as degeneracy.core_decomposition: the degeneracy, the core
+# number of every vertex and a degeneracy ordering
+def parallel_core_decomposition(offsets, neighbors, jobs=None):
+    n = len(offsets) - 1
+    if n == 0:
+        return 0, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    jobs = jobs or multiprocessing.cpu_count()
+
+    blocks = []
+    # Views on the shared blocks, dropped before the blocks are closed
+    shared_state = {}
+    pool = None
+    try:
+        specs = {}
+        for key, array in (('offsets', offsets), ('neighbors', neighbors)):
+            specs[key], block = share_array(array)
+            blocks.append(block)
+        # alive and frontier are written by the parent and read by workers
+        for key, dtype in (('alive', bool), ('frontier', np.int64)):
+            block = shared_memory.SharedMemory(create=True, size=n * np.dtype(dtype).itemsize)
+            blocks.append(block)
+            specs[key] = ('shm', block.name, np.dtype(dtype).str, 0, (n,))
+            shared_state[key] = np.ndarray((n,), dtype=dtype, buffer=block.buf)
+        alive = shared_state['alive']
+        alive[:] = True
+
+        degrees = np.diff(offsets).astype(np.int64)
+        core = np.zeros(n, dtype=np.int64)
+        order = []
+        remaining = n
+        if jobs > 1:
+            pool = multiprocessing.Pool(jobs, initializer=init_worker, initargs=(specs,))
+        k = 0
+        while remaining:
+            frontier = np.flatnonzero(alive & (degrees <= k))
+            if len(frontier) == 0:
+                k = int(degrees[alive].min())
+                continue
+            while len(frontier):
+                core[frontier] = k
+                alive[frontier] = False
+                order.append(frontier)
+                remaining -= len(frontier)
+
+                work = np.cumsum(offsets[frontier + 1] - offsets[frontier])
+                if pool is None or work[-1] < MIN_PARALLEL_WORK:
+                    results = [frontier_decrements(offsets, neighbors, alive, frontier)]
+                else:
+                    # Give every worker about the same number of adjacency entries
+                    shared_state['frontier'][:len(frontier)] = frontier
+                    cuts = np.searchsorted(work, np.linspace(0, work[-1], jobs + 1)[1:-1])
+                    cuts = np.r_[0, cuts, len(frontier)].tolist()
+                    results = pool.map(worker_decrements, list(zip(cuts[:-1], cuts[1:])))
+
+                touched = []
+                for vertices, counts in results:
+                    degrees[vertices] -= counts
+                    touched.append(vertices)
+                touched = np.concatenate(touched)
+                frontier = sorted_unique(touched[degrees[touched] <= k])
+            k += 1
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        alive = None
+        shared_state.clear()
+        for block in blocks:
+            if block is not None:
+                block.close()
+                block.unlink()
+
+    return int(core.max()), core, np.concatenate(order)
@@ -0,0 +1,45 @@
+#! /usr/bin/env python3
+
+# Persistent cache of per-graph results in an SQLite database.
+#
+# Entries are keyed by the absolute path, mtime and size of the graph file,
+# so an edited file is treated as a new graph, and by the format it was
+# read as. Each entry holds V, E, the degeneracy and the size of every
+# k-shell (the core number histogram).
+
+import os
+import sqlite3
+
+def open_result_cache(filename):
+    connection = sqlite3.connect(filename)
+    connection.execute('''CREATE TABLE IF NOT EXISTS graph_results (
+        path TEXT NOT NULL,
+        mtime INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        format TEXT NOT NULL,
+        vertices INTEGER NOT NULL,
+        edges INTEGER NOT NULL,
+        degeneracy INTEGER NOT NULL,
+        shells TEXT NOT NULL,
+        PRIMARY KEY (path, mtime, size, format))''')
+    connection.commit()
+    return connection
+
+def file_key(filename, graph_format):
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, graph_format
+
+# Returns (V, E, degeneracy, shells) or None
+def lookup_result(connection, filename, graph_format):
+    row = connection.execute('SELECT vertices, edges, degeneracy, shells FROM graph_results '
+                             'WHERE path = ? AND mtime = ? AND size = ? AND format = ?',
+                             file_key(filename, graph_format)).fetchone()
+    if row is None:
+        return None
+    V, E, degeneracy, shells = row
+    return V, E, degeneracy, tuple(int(s) for s in shells.split(',') if s)
+
+def store_result(connection, filename, graph_format, result):
+    V, E, degeneracy, shells = result
+    connection.execute('INSERT OR REPLACE INTO graph_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                       file_key(filename, graph_format) + (V, E, degeneracy, ",".join(str(s) for s in shells)))
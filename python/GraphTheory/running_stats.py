@@ -0,0 +1,121 @@
+#! /usr/bin/env python3
+
+# Online summary statistics for long sweeps.
+#
+# RunningStats keeps the count, sum and sum of squares, the min and max and
+# a histogram of the values seen. Degeneracies are small integers, so the
+# sums are exact, the histogram has one entry per distinct value and gives
+# an exact median, and memory stays independent of the number of samples.
+# The mean and standard deviation are rounded only once, so they do not
+# depend on the order of the values: summarize() of a list gives the same
+# statistics as adding its values one by one.
+#
+# HistogramStats does the same per bin for a series of histograms (one per
+# graph), keeping the count, sum and sum of squares of every bin. Bin i only
+# counts the histograms that are longer than i, unless pad() is called to
+# count every histogram in every bin, as if they were all padded with zeros.
+
+import math
+import numpy as np
+
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.sum = 0
+        self.sumsq = 0
+        self.min = None
+        self.max = None
+        self.histogram = {}
+
+    def add(self, value):
+        self.count += 1
+        self.sum += int(value)
+        self.sumsq += int(value) ** 2
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.histogram[value] = self.histogram.get(value, 0) + 1
+
+    def mean(self):
+        if self.count == 0:
+            return float('nan')
+        return self.sum / self.count
+
+    # Sample standard deviation (ddof=1), nan for fewer than two values. The
+    # variance is a quotient of Python integers, so it is exact up to the
+    # final rounding.
+    def std(self):
+        if self.count < 2:
+            return float('nan')
+        return math.sqrt((self.count * self.sumsq - self.sum * self.sum) / (self.count * (self.count - 1)))
+
+    def median(self):
+        if self.count == 0:
+            return float('nan')
+        # Values at (0-based) ranks lo and hi, the same as np.median
+        lo = (self.count - 1) // 2
+        hi = self.count // 2
+        seen = 0
+        lo_value = None
+        for value in sorted(self.histogram):
+            seen += self.histogram[value]
+            if lo_value is None and seen > lo:
+                lo_value = value
+            if seen > hi:
+                return (lo_value + value) / 2
+        return float('nan')
+
+def summarize(values):
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    return stats
+
+class HistogramStats:
+    def __init__(self):
+        self.count = np.zeros(0, dtype=np.int64)
+        self.sum = np.zeros(0, dtype=np.int64)
+        self.sumsq = np.zeros(0, dtype=np.int64)
+        self.histograms = 0
+
+    def grow(self, length):
+        if length > len(self.count):
+            extra = length - len(self.count)
+            self.count = np.r_[self.count, np.zeros(extra, dtype=np.int64)]
+            self.sum = np.r_[self.sum, np.zeros(extra, dtype=np.int64)]
+            self.sumsq = np.r_[self.sumsq, np.zeros(extra, dtype=np.int64)]
+
+    def add(self, histogram):
+        histogram = np.asarray(histogram, dtype=np.int64)
+        self.histograms += 1
+        self.grow(len(histogram))
+        self.count[:len(histogram)] += 1
+        self.sum[:len(histogram)] += histogram
+        self.sumsq[:len(histogram)] += histogram * histogram
+
+    # Add the bins of another HistogramStats, e.g. one from another process.
+    # The sums are integers, so the order of merging does not matter.
+    def merge(self, other):
+        self.histograms += other.histograms
+        self.grow(len(other.count))
+        self.count[:len(other.count)] += other.count
+        self.sum[:len(other.count)] += other.sum
+        self.sumsq[:len(other.count)] += other.sumsq
+
+    # Zeros add nothing to the sums, so padding only changes the counts
+    def pad(self):
+        self.count[:] = self.histograms
+
+    def mean(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sum / self.count
+
+    # Sample standard deviation (ddof=1) of every bin, nan where a bin has
+    # fewer than two values. The numerator is computed on Python integers
+    # so it is exact.
+    def std(self):
+        count = self.count.astype(object)
+        numerator = count * self.sumsq.astype(object) - self.sum.astype(object) ** 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(numerator.astype(float) / (self.count * (self.count - 1.0)))
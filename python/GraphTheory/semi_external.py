@@ -0,0 +1,131 @@
+#! /usr/bin/env python3
+
+# Semi-external core decomposition for graphs that do not fit in memory.
+#
+# The input is an edge file sorted by (source, target) that lists every
+# edge in both directions, so the adjacency of each vertex is a contiguous
+# run of lines. It is either a text edge list or a raw binary file of
+# int64 (source, target) pairs ending in '.bin'.
+#
+# Only O(V) state is kept in memory (core estimates and active flags).
+# Core estimates start at the degree and are repeatedly lowered to the
+# h-index of the neighbors' estimates, streaming the adjacency from disk
+# block by block, until nothing changes. The fixed point is the core
+# number (Lu et al. 2016, the SemiCore algorithm of Wen et al. 2016).
+
+import numpy as np
+
+from edge_list import CHUNK_SIZE, iter_edge_chunks
+
+def iter_binary_chunks(filename, chunk_size=CHUNK_SIZE):
+    count = max(2, chunk_size // 8 // 2 * 2)
+    with open(filename, 'rb') as in_file:
+        while True:
+            edges = np.fromfile(in_file, dtype=np.int64, count=count)
+            if len(edges) == 0:
+                break
+            edges = edges.reshape(-1, 2)
+            yield np.ascontiguousarray(edges[:, 0]), np.ascontiguousarray(edges[:, 1])
+
+def iter_chunks(filename, chunk_size=CHUNK_SIZE):
+    if filename.endswith('.bin'):
+        return iter_binary_chunks(filename, chunk_size)
+    return iter_edge_chunks(filename, chunk_size)
+
+# Yield the adjacency of the file in blocks of whole vertices as (src, dst)
+# with self-loops and duplicate edges removed. The edges of the last vertex
+# of each block are held back until the next block shows it is complete.
+# The held back pieces are only concatenated once the vertex ends, so a hub
+# spanning many chunks costs O(deg) rather than O(deg^2 / chunk).
+def iter_adjacency_blocks(filename, chunk_size=CHUNK_SIZE):
+    carry_src, carry_dst = [], []
+    last = None
+    for src, dst in iter_chunks(filename, chunk_size):
+        if len(src) == 0:
+            continue
+        # Sortedness of the chunk, including its first edge against the
+        # last edge before it
+        if last is not None:
+            src_step = np.r_[src[0] - last[0], np.diff(src)]
+            dst_step = np.r_[dst[0] - last[1], np.diff(dst)]
+        else:
+            src_step, dst_step = np.diff(src), np.diff(dst)
+        if np.any(src_step < 0) or np.any((src_step == 0) & (dst_step < 0)):
+            raise ValueError("{} is not sorted by (source, target)".format(filename))
+        last = src[-1], dst[-1]
+        cut = np.searchsorted(src, src[-1])
+        if cut == 0 and (not carry_src or carry_src[0][0] == src[0]):
+            carry_src.append(src)
+            carry_dst.append(dst)
+            continue
+        block_src, block_dst = clean_adjacency(np.concatenate(carry_src + [src[:cut]]), np.concatenate(carry_dst + [dst[:cut]]))
+        carry_src, carry_dst = [src[cut:]], [dst[cut:]]
+        if len(block_src):
+            yield block_src, block_dst
+    if carry_src:
+        src, dst = clean_adjacency(np.concatenate(carry_src), np.concatenate(carry_dst))
+        if len(src):
+            yield src, dst
+
+def clean_adjacency(src, dst):
+    keep = src != dst
+    keep[1:] &= (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    return src[keep], dst[keep]
+
+def grow(array, length):
+    if len(array) >= length:
+        return array
+    grown = np.zeros(length, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+# Vertices of a sorted block and the number of edges of each
+def block_vertices(src):
+    starts = np.flatnonzero(np.r_[True, src[1:] != src[:-1]])
+    return src[starts], starts, np.diff(np.r_[starts, len(src)])
+
+# h-index of the neighbor values of every vertex in a sorted block: the
+# largest h such that the vertex has at least h neighbors with value >= h
+def block_h_index(src, values):
+    vertices, starts, counts = block_vertices(src)
+    # Sort the values of every vertex in decreasing order
+    values = values[np.lexsort((-values, src))]
+    rank = np.arange(len(src)) - np.repeat(starts, counts) + 1
+    return vertices, counts, np.maximum.reduceat(np.minimum(rank, values), starts)
+
+# Returns (core, present, E) where core[v] is the core number of vertex v,
+# present[v] says whether v occurs in the file at all and E is the number
+# of edge records read
+def semi_external_core_numbers(filename, chunk_size=CHUNK_SIZE):
+    # First pass: degrees (without self-loops and duplicates) and vertex ids
+    core = np.zeros(0, dtype=np.int32)
+    present = np.zeros(0, dtype=bool)
+    E = 0
+    for src, dst in iter_chunks(filename, chunk_size):
+        E += len(src)
+        present = grow(present, int(max(src.max(), dst.max())) + 1)
+        present[src] = True
+        present[dst] = True
+    core = np.zeros(len(present), dtype=np.int32)
+    for src, _ in iter_adjacency_blocks(filename, chunk_size):
+        # Blocks hold whole vertices, so every vertex is seen once
+        vertices, _, counts = block_vertices(src)
+        core[vertices] = counts
+
+    # Each pass recomputes only the vertices with a neighbor that changed in
+    # the previous pass, updating the estimates in place
+    active = np.ones(len(core), dtype=bool)
+    while active.any():
+        next_active = np.zeros(len(core), dtype=bool)
+        for src, dst in iter_adjacency_blocks(filename, chunk_size):
+            rows = active[src]
+            if not rows.any():
+                continue
+            src, dst = src[rows], dst[rows]
+            vertices, counts, h = block_h_index(src, core[dst])
+            lowered = h < core[vertices]
+            if lowered.any():
+                core[vertices[lowered]] = h[lowered]
+                next_active[dst[np.repeat(lowered, counts)]] = True
+        active = next_active
+    return core, present, E
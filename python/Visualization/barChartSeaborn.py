@@ -8,10 +8,14 @@ import matplotlib.cm as cm
 import numpy as np
 import math
 
-plt.style.use('seaborn')
-matplotlib.rcParams.update({'errorbar.capsize': 7, 'lines.linewidth':1})
+from csv_columns import read_columns
 
-def parse_arguments():
+# Sets 'global' parameters: the seaborn style and line widths
+def apply_style():
+    plt.style.use('seaborn')
+    matplotlib.rcParams.update({'errorbar.capsize': 7, 'lines.linewidth':1})
+
+def parse_arguments(argv=None):
     parser = argparse.ArgumentParser()
 
     parser.add_argument("data_file", help="The file containing data")
@@ -25,11 +29,11 @@ def parse_arguments():
     parser.add_argument("--error", nargs=1, dest='error', help="Column(s) to use as error")
     parser.add_argument("--ymin", nargs=1, dest='y_min', type=float, help="minimum of y axis")
     parser.add_argument("--ymax", nargs=1, dest='y_max', type=float, help="maximum of y axis")
+    parser.add_argument("--cache", action='store_true', help="Cache the parsed columns in .npy files next to the csv and reuse them while it is unchanged")
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
-if __name__ == '__main__':
-    args = parse_arguments()
+def main(args):
     x_axis = int(args.x_axis)
     y_axis = int(args.y_axis)
     error_index = None
@@ -37,19 +41,11 @@ if __name__ == '__main__':
         error_index = int(args.error[0])
 
     y_label = args.y_label
-    X,Y,E = [], [], []
-
-    header = None 
-    with open(args.data_file) as input_file:
-        for line in input_file:
-            if header:
-                line = line.split(',')
-                X.append(line[x_axis])
-                Y.append(float(line[y_axis]))
-                if args.error:
-                    E.append(float(line[error_index]))
-            else:
-                header = line.split(',')
+    if args.error:
+        header, (X, Y, E) = read_columns(args.data_file, [x_axis, y_axis, error_index], ['str', 'float', 'float'], cache=args.cache)
+    else:
+        header, (X, Y) = read_columns(args.data_file, [x_axis, y_axis], ['str', 'float'], cache=args.cache)
+        E = []
 
     fig = plt.figure(dpi=100)
     ax = fig.add_subplot(111)
@@ -111,3 +107,7 @@ if __name__ == '__main__':
     else:
         print(args.fig_name[0])
         plt.savefig(args.fig_name[0], bbox_inches='tight', dpi=1000, format='pdf')
+
+if __name__ == '__main__':
+    apply_style()
+    main(parse_arguments())
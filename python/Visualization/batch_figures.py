@@ -0,0 +1,144 @@
+#! /usr/bin/env python
+
+# Draws a whole set of figures in a few processes instead of starting one
+# script per figure.
+#
+# The manifest (JSON, or YAML if PyYAML is installed) lists the figures,
+# each as the script and the command line it would be given:
+#
+#   figures:
+#     - script: scatterPlot
+#       args: [results.csv, 0, 1, "2,3", "n", "Time,Memory", "", --save_fig, time.pdf]
+#     - script: heatMap
+#       args: [results.csv, 1, 2, 6, "n", "p", "ratio", "", --save_fig, ratio.pdf]
+#
+# A top level list is read as the list of figures. Every worker imports the
+# scripts once and keeps the csv columns of the file it is drawing in
+# memory. The figures of one data file are split into up to --jobs tasks, so
+# even a single results file is drawn by every worker. A worker parses a
+# file once for all the tasks of that file it draws in a row, and the
+# workers parse it at the same time, so a file costs about one parse of
+# wall time. Each figure is drawn with its script's style inside its own
+# rc_context.
+
+import argparse
+import contextlib
+import functools
+import importlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import sys
+import traceback
+
+import matplotlib
+
+SCRIPTS = ['barChartSeaborn', 'boxPlot', 'heatMap', 'jitterPlot', 'scatterPlot']
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("manifest", help="JSON or YAML file listing the figures to draw")
+    parser.add_argument("--jobs", help="number of worker processes (0 uses every core)", type=int, default=1, dest="jobs")
+    parser.add_argument("--verbose", action='store_true', help="Show what the scripts print")
+
+    return parser.parse_args()
+
+def load_manifest(filename):
+    with open(filename) as manifest_file:
+        text = manifest_file.read()
+    if os.path.splitext(filename)[1].lower() in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            sys.exit("PyYAML is needed to read {}, use a JSON manifest instead".format(filename))
+        manifest = yaml.safe_load(text)
+    else:
+        manifest = json.loads(text)
+    if isinstance(manifest, dict):
+        manifest = manifest.get('figures', [])
+    return manifest
+
+# The script module and parsed arguments of every figure, exits on the first
+# figure the script's parser rejects
+def parse_figures(figures):
+    parsed = []
+    for number, figure in enumerate(figures):
+        if figure.get('script') not in SCRIPTS:
+            sys.exit("figure {}: script must be one of {}".format(number, ', '.join(SCRIPTS)))
+        module = importlib.import_module(figure['script'])
+        argv = [str(arg) for arg in figure.get('args', [])]
+        try:
+            args = module.parse_arguments(argv)
+        except SystemExit:
+            sys.exit("figure {}: bad arguments for {}: {}".format(number, figure['script'], ' '.join(argv)))
+        parsed.append((number, figure['script'], args))
+    return parsed
+
+# Data file whose columns this process keeps
+current_file = None
+
+def init_worker():
+    matplotlib.use('Agg')
+
+# Figures of every data file split into up to jobs tasks of about the same
+# size, the tasks of a file next to each other and larger files first
+def split_tasks(figures, jobs):
+    by_file = {}
+    for figure in figures:
+        by_file.setdefault(os.path.abspath(figure[2].data_file), []).append(figure)
+    tasks = []
+    for file_figures in sorted(by_file.values(), key=len, reverse=True):
+        size = math.ceil(len(file_figures) / min(jobs, len(file_figures)))
+        tasks += [file_figures[i:i + size] for i in range(0, len(file_figures), size)]
+    return tasks
+
+# Draws a list of (number, script, args) of one data file and returns the
+# number and error message of every figure that failed. Only the columns of
+# that data file are kept in memory.
+def draw_figures(figures, verbose=False):
+    global current_file
+    import matplotlib.pyplot as plt
+    import csv_columns
+    data_file = os.path.abspath(figures[0][2].data_file)
+    if data_file != current_file:
+        csv_columns.remember_columns()
+        current_file = data_file
+    failed = []
+    for number, script, args in figures:
+        module = importlib.import_module(script)
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        try:
+            with matplotlib.rc_context(), output:
+                module.apply_style()
+                module.main(args)
+        except Exception:
+            failed.append((number, traceback.format_exc()))
+        finally:
+            plt.close('all')
+    return failed
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    matplotlib.use('Agg')
+    figures = parse_figures(load_manifest(args.manifest))
+
+    failed = []
+    jobs = args.jobs or os.cpu_count()
+    tasks = split_tasks(figures, jobs)
+    if jobs == 1 or len(tasks) == 1:
+        init_worker()
+        for task in tasks:
+            failed += draw_figures(task, args.verbose)
+    else:
+        with multiprocessing.Pool(min(jobs, len(tasks)), initializer=init_worker) as pool:
+            for task_failed in pool.imap_unordered(functools.partial(draw_figures, verbose=args.verbose), tasks):
+                failed += task_failed
+
+    for number, error in sorted(failed):
+        sys.stderr.write("figure {} failed:\n{}\n".format(number, error))
+    print("{} of {} figures drawn".format(len(figures) - len(failed), len(figures)))
+    if failed:
+        sys.exit(1)
@@ -2,16 +2,20 @@
 import argparse
 import itertools
 import matplotlib
-matplotlib.rcParams.update({'errorbar.capsize': 5, 'lines.linewidth':5})
 import matplotlib.pyplot as plt
 import matplotlib.ticker as tick
 import matplotlib.cm as cm
 import numpy as np
 import math
 
-plt.style.use('seaborn')
+from csv_columns import read_columns, split_groups
 
-def parse_arguments():
+# Sets 'global' parameters: the seaborn style and line widths
+def apply_style():
+    matplotlib.rcParams.update({'errorbar.capsize': 5, 'lines.linewidth':5})
+    plt.style.use('seaborn')
+
+def parse_arguments(argv=None):
     parser = argparse.ArgumentParser()
 
     parser.add_argument("data_file", help="The file containing data")
@@ -19,27 +23,17 @@ def parse_arguments():
     parser.add_argument("x_axis", help="Which column to use as x-axis")
     parser.add_argument("title", help="What to use as chart title")
     parser.add_argument("--save_fig", nargs=1, dest='fig_name', help="Use log scale for y-axis")
+    parser.add_argument("--cache", action='store_true', help="Cache the parsed columns in .npy files next to the csv and reuse them while it is unchanged")
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
-if __name__ == '__main__':
-    args = parse_arguments()
+def main(args):
     group_index = int(args.group)
     x_axis = int(args.x_axis)
+    header, ((group_labels, group_codes), x_values) = read_columns(args.data_file, [group_index, x_axis], ['group', 'float'], cache=args.cache)
     data = {}
-
-    header = None 
-    with open(args.data_file) as input_file:
-        for line in input_file:
-            if header:
-                line = line.split(',')
-                group = line[group_index]
-                if group not in data:
-                    data[group] = []
-
-                data[group].append(float(line[x_axis]))
-            else:
-                header = line.split(',')
+    for group, (values,) in zip(group_labels, split_groups(group_codes, len(group_labels), x_values)):
+        data[group] = values
 
     fig = plt.figure(dpi=100)
     ax = fig.add_subplot(111)
@@ -78,3 +72,7 @@ if __name__ == '__main__':
     else:
         print(args.fig_name[0])
         plt.savefig(args.fig_name[0], bbox_inches='tight', dpi=1000, format='pdf')
+
+if __name__ == '__main__':
+    apply_style()
+    main(parse_arguments())
@@ -0,0 +1,194 @@
+#! /usr/bin/env python
+
+# Columnar reader for the csv result files plotted by the scripts here.
+#
+# The first line is the header, every other line is a row. Only the
+# requested columns are kept and each comes back as a typed NumPy array:
+#
+#   float, int  numbers
+#   str         stripped text, for columns the caller still has to filter
+#   group       text factorized to (labels, codes): labels in order of first
+#               appearance and the int64 code of every row
+#
+# The file is read once, in blocks of whole lines, and every block is parsed
+# by np.loadtxt (once per kind of column), so no Python code runs per cell.
+# split_groups hands out the rows of every group as views of one sorted
+# copy of each column.
+#
+# With cache=True every column is also saved as .npy files in a sidecar
+# directory <file>.columns, named after the column, its kind and the mtime
+# and size of the csv file. Later reads of an unchanged file memory-map
+# them instead of parsing the csv; only columns not cached yet are parsed.
+#
+# After remember_columns() the columns are also kept in memory, so a
+# process drawing many figures from the same file parses each column once.
+# Callers must not modify the arrays they get back.
+
+import glob
+import io
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GraphTheory'))
+from edge_list import CHUNK_SIZE, iter_line_blocks
+from graph_cache import source_stamp
+
+KINDS = {'float': float, 'int': np.int64}
+
+# Columns read so far, by file, file version, column and kind
+remembered = None
+
+# Starts keeping columns, or drops the ones kept so far
+def remember_columns():
+    global remembered
+    remembered = {}
+
+# Distinct values of an array in order of first appearance and the index
+# of every element in that order
+def factorize(values):
+    if len(values) == 0:
+        return values[:0], np.zeros(0, dtype=np.int64)
+    uniques, first, inverse = np.unique(values, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return uniques[order], rank[inverse.ravel()]
+
+def sidecar_path(filename, column, kind, part='values'):
+    mtime, size = source_stamp(filename)
+    name = "{}.{}.{}.{}-{}.npy".format(column, kind, part, mtime, size)
+    return os.path.join(filename + '.columns', name)
+
+# A cached column, or None if there is none for the current csv file
+def load_cached_column(filename, column, kind):
+    path = sidecar_path(filename, column, kind)
+    if not os.path.exists(path):
+        return None
+    values = np.load(path, mmap_mode='r')
+    if kind == 'group':
+        return np.load(sidecar_path(filename, column, kind, 'labels')).tolist(), values
+    return values
+
+# Written under a temporary name and renamed, like the graph cache
+def save_array(path, array):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out_file:
+            np.save(out_file, array)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+# Save a column, dropping the files cached for older versions of the csv.
+# Group labels are written first so the codes never appear without them.
+def write_cached_column(filename, column, kind, value):
+    path = sidecar_path(filename, column, kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    stamp = path.rsplit('.', 2)[1]
+    for stale in glob.glob(os.path.join(os.path.dirname(path), "{}.{}.*.npy".format(column, kind))):
+        if stale.rsplit('.', 2)[1] != stamp:
+            os.unlink(stale)
+    if kind == 'group':
+        labels, value = value
+        save_array(sidecar_path(filename, column, kind, 'labels'), np.array(labels, dtype=str))
+    save_array(path, value)
+
+# The columns of a csv file, parsed block by block
+def parse_columns(filename, columns, kinds, chunk_size=CHUNK_SIZE):
+    parts = [[] for column in columns]
+    labels = [{} for column in columns]
+    skip = True
+    for block in iter_line_blocks(filename, chunk_size):
+        if skip:
+            block = block.partition(b'\n')[2]
+            skip = False
+        if not block or block.isspace():
+            continue
+        # One typed parse of the block per kind of column
+        for dtype in (float, np.int64, str):
+            wanted = [i for i, kind in enumerate(kinds) if KINDS.get(kind, str) is dtype]
+            if not wanted:
+                continue
+            cells = np.loadtxt(io.BytesIO(block), dtype=dtype, delimiter=',', usecols=[columns[i] for i in wanted],
+                               comments=None, ndmin=2, encoding='utf-8')
+            for j, i in enumerate(wanted):
+                values = cells[:, j]
+                if kinds[i] == 'str':
+                    values = np.char.strip(values)
+                elif kinds[i] == 'group':
+                    # Codes of a block are mapped onto the labels seen so far
+                    block_labels, codes = factorize(np.char.strip(values))
+                    known = labels[i]
+                    values = np.array([known.setdefault(label, len(known)) for label in block_labels.tolist()], dtype=np.int64)[codes]
+                parts[i].append(values)
+
+    result = []
+    for i, kind in enumerate(kinds):
+        if kind == 'group':
+            codes = np.concatenate(parts[i]) if parts[i] else np.zeros(0, dtype=np.int64)
+            result.append((list(labels[i]), codes))
+        elif parts[i]:
+            result.append(np.concatenate(parts[i]))
+        else:
+            result.append(np.zeros(0, dtype=KINDS.get(kind, str)))
+    return result
+
+# Returns the header (the first line split on ',') and one entry per column,
+# kinds[i] being the kind of columns[i] (float by default)
+def read_columns(filename, columns, kinds=None, chunk_size=CHUNK_SIZE, cache=False):
+    kinds = kinds or ['float'] * len(columns)
+    with open(filename) as input_file:
+        header = input_file.readline().rstrip('\n').split(',')
+    if cache or remembered is not None:
+        keys = [(os.path.abspath(filename), source_stamp(filename), column, kind) for column, kind in zip(columns, kinds)]
+        result = [remembered.get(key) if remembered is not None else None for key in keys]
+        for i, value in enumerate(result):
+            if value is None and cache:
+                result[i] = load_cached_column(filename, columns[i], kinds[i])
+        missing = [i for i, value in enumerate(result) if value is None]
+        if missing:
+            parsed = parse_columns(filename, [columns[i] for i in missing], [kinds[i] for i in missing], chunk_size)
+            for i, value in zip(missing, parsed):
+                if cache:
+                    write_cached_column(filename, columns[i], kinds[i], value)
+                result[i] = value
+        if remembered is not None:
+            remembered.update(zip(keys, result))
+        return header, result
+    return header, parse_columns(filename, columns, kinds, chunk_size)
+
+# For every group code 0..count-1, the rows of each column in that group (in
+# file order), as views of one copy of the column sorted by group
+def split_groups(codes, count, *columns):
+    order = np.argsort(codes, kind='stable')
+    bounds = np.r_[0, np.cumsum(np.bincount(codes, minlength=count))]
+    columns = [column[order] for column in columns]
+    return [[column[bounds[g]:bounds[g + 1]] for column in columns] for g in range(count)]
+
+# The series layout used by the scatter and jitter plots: data[group] holds
+# 'x', one array per column of y_axes and, with error_index (y column to
+# error column), 'error' mapping every y column to its errors. Errors larger
+# than their value are clamped to 0.999 of it. Groups are in order of first
+# appearance.
+def read_series(filename, group_index, x_axis, y_axes, error_index=None, cache=False):
+    error_index = error_index or {}
+    errors = [y for y in y_axes if y in error_index]
+    columns = [group_index, x_axis] + y_axes + [error_index[y] for y in errors]
+    header, values = read_columns(filename, columns, ['group'] + ['float'] * (len(columns) - 1), cache=cache)
+    (labels, codes), series = values[0], values[1:]
+    for i, y in enumerate(errors):
+        value, error = series[1 + y_axes.index(y)], series[1 + len(y_axes) + i]
+        series[1 + len(y_axes) + i] = np.where(error > value, 0.999 * value, error)
+
+    data = {}
+    for group, views in zip(labels, split_groups(codes, len(labels), *series)):
+        data[group] = {'x': views[0]}
+        for i, y in enumerate(y_axes):
+            data[group][y] = views[1 + i]
+        if error_index:
+            data[group]['error'] = dict(zip(errors, views[1 + len(y_axes):]))
+    return header, data
@@ -1,37 +1,113 @@
 #! /usr/bin/env python
 
 import argparse
+import os
+import sys
 import matplotlib.pyplot as plt
-import matplotlib.cm as cm 
+import matplotlib.cm as cm
 import numpy as np
 import networkx as nx
+from matplotlib.collections import LineCollection
+
+# Segments packed into each path of the edge LineCollection. Building one
+# Path per segment dominates the drawing time of large graphs.
+SEGMENTS_PER_PATH = 64
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GraphTheory'))
+from graph_io import FORMATS, read_graph as read_graph_file
 
 def parse_arguments():
     parser = argparse.ArgumentParser()
 
     parser.add_argument("graph_file", help="The file containing the graph")
-    parser.add_argument("graph_format", help="Format of the graph")
+    parser.add_argument("graph_format", help="Format of the graph", nargs='?', choices=['auto'] + FORMATS, default='auto')
+    parser.add_argument("-o", help="Save the drawing to this file instead of showing it", dest="output_file")
+    parser.add_argument("--dpi", help="Resolution of the saved drawing", type=int, default=300, dest="dpi")
+    parser.add_argument("--node-size", help="Marker size of the nodes", type=float, default=5, dest="node_size")
+    parser.add_argument("--label-limit", help="Only label the nodes of graphs with at most this many nodes", type=int, default=200, dest="label_limit")
+    parser.add_argument("--rasterize", help="Embed nodes and edges as a bitmap in vector output", action='store_true', dest="rasterize")
+    parser.add_argument("--viewer", help="Interactive view that only draws what is visible, with density tiles for dense regions", action='store_true', dest="viewer")
+    parser.add_argument("--max-nodes", help="Nodes drawn individually by --viewer before dense regions become tiles", type=int, default=50000, dest="max_nodes")
+    parser.add_argument("--decimate", help="When saving, draw only one edge per pair of end pixels", action='store_true', dest="decimate")
 
     return parser.parse_args()
 
-def read_graph(graph_file, graph_format):
+def to_networkx(graph):
+    ids = graph.ids.tolist()
     G = nx.Graph()
-    if graph_format == 'mst':
-        with open(graph_file) as input_file:
-            for line in input_file:
-                if line[0] == 'n':
-                    _, key, x, y = line.strip('\n').split()
-                    G.add_node(int(key), pos=(int(x),int(y)))
-                elif line[0] == 'e':
-                    _, u, v, weight = line.strip('\n').split()
-                    G.add_edge(int(u),int(v))
-    else:
-        print("Graph format '{}' is not currently supported".format(graph_format))
+    G.add_nodes_from(ids)
+    if graph.pos is not None:
+        placed = ~np.isnan(graph.pos).any(axis=1)
+        nx.set_node_attributes(G, dict(zip(graph.ids[placed].tolist(), map(tuple, graph.pos[placed].tolist()))), 'pos')
+    G.add_edges_from(zip(graph.ids[graph.src].tolist(), graph.ids[graph.dst].tolist()))
     return G
 
+def read_graph(graph_file, graph_format='auto'):
+    return to_networkx(read_graph_file(graph_file, graph_format))
+
+# (n, 2) coordinates of the nodes, from the file or from a networkx layout
+# when the format has none
+def node_positions(graph):
+    if graph.pos is not None and not np.isnan(graph.pos).any():
+        return graph.pos
+    layout = nx.spring_layout(to_networkx(graph))
+    return np.array([layout[key] for key in graph.ids.tolist()], dtype=float).reshape(-1, 2)
+
+# Keep one segment per pair of end pixels (in either direction) under the
+# given transform, and drop segments that start and end in the same pixel
+def decimate_segments(segments, transform):
+    pixels = np.floor(transform.transform(segments.reshape(-1, 2))).astype(np.int64)
+    pixels -= pixels.min(axis=0)
+    width = int(pixels.max()) + 1
+    cells = pixels[:, 0] * width + pixels[:, 1]
+    start, end = cells[0::2], cells[1::2]
+    keys = np.minimum(start, end) * (width * width) + np.maximum(start, end)
+    _, first = np.unique(keys[start != end], return_index=True)
+    return segments[np.flatnonzero(start != end)[first]]
+
+# Chain the (m, 2, 2) segments into polylines of up to SEGMENTS_PER_PATH
+# segments separated by NaN breaks
+def pack_segments(segments):
+    count = -(-len(segments) // SEGMENTS_PER_PATH) * SEGMENTS_PER_PATH
+    packed = np.full((count, 3, 2), np.nan)
+    packed[:len(segments), :2] = segments
+    return packed.reshape(-1, 3 * SEGMENTS_PER_PATH, 2)
+
+# Draw every edge as one LineCollection and every node as one scatter. Labels
+# are only drawn up to label_limit nodes. With decimate, segments that would
+# fall on the same pixels of the saved figure are drawn once.
+def draw_graph(ax, graph, pos, node_size=5, label_limit=200, rasterize=False, decimate=False):
+    segments = np.stack((pos[graph.src], pos[graph.dst]), axis=1)
+    if len(pos):
+        low, high = pos.min(axis=0), pos.max(axis=0)
+        margin = np.where(high > low, (high - low) * 0.05, 1)
+        ax.set_xlim(low[0] - margin[0], high[0] + margin[0])
+        ax.set_ylim(low[1] - margin[1], high[1] + margin[1])
+    if decimate and len(segments):
+        segments = decimate_segments(segments, ax.transData)
+    edges = LineCollection(pack_segments(segments), colors='k', linewidths=1, rasterized=rasterize, zorder=1)
+    ax.add_collection(edges, autolim=False)
+    ax.scatter(pos[:, 0], pos[:, 1], s=node_size, c='#1f78b4', rasterized=rasterize, zorder=2)
+    if graph.n <= label_limit:
+        for key, (x, y) in zip(graph.ids.tolist(), pos.tolist()):
+            ax.text(x, y, str(key), ha='center', va='center', zorder=3)
+    ax.set_axis_off()
+
 if __name__ == '__main__':
     args = parse_arguments()
-    G = read_graph(args.graph_file, args.graph_format)
-    pos = nx.get_node_attributes(G, 'pos')
-    nx.draw(G, pos, node_size=5, with_labels=True)
-    plt.show()
+    graph = read_graph_file(args.graph_file, args.graph_format)
+    pos = node_positions(graph)
+    if args.viewer:
+        from graph_viewer import GraphViewer
+        fig, ax = plt.subplots()
+        ax.set_axis_off()
+        viewer = GraphViewer(ax, graph, pos, args.node_size, args.label_limit, args.max_nodes)
+        plt.show()
+    else:
+        fig, ax = plt.subplots(dpi=args.dpi if args.output_file else None)
+        # Pixels are only known for a saved figure
+        draw_graph(ax, graph, pos, args.node_size, args.label_limit, args.rasterize, args.decimate and args.output_file is not None)
+        if args.output_file:
+            fig.savefig(args.output_file, dpi=args.dpi)
+        else:
+            plt.show()
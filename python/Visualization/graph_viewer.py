@@ -0,0 +1,204 @@
+#! /usr/bin/env python
+
+# Interactive viewer for large geometric graphs.
+#
+# Node positions and edge bounding boxes are bucketed into a uniform grid.
+# Whenever the view limits change only the nodes and edges inside the view
+# are looked up and drawn. When more than max_nodes nodes are inside the
+# view, the cells holding more than their share of max_nodes of them are
+# drawn as density tiles (one image, coloured by node count) instead of node
+# by node, so the amount drawn stays bounded at every zoom level while sparse
+# regions keep their detail. Only nodes inside the view are counted, so
+# zooming into a dense cell shows its nodes once few enough of them are left.
+
+import numpy as np
+import matplotlib.colors as colors
+from matplotlib.collections import LineCollection
+
+from displayGraph import pack_segments
+
+# Aim for about this many nodes per grid cell
+NODES_PER_CELL = 16
+
+def in_view(points, xlim, ylim):
+    return ((points[:, 0] >= xlim[0]) & (points[:, 0] <= xlim[1]) &
+            (points[:, 1] >= ylim[0]) & (points[:, 1] <= ylim[1]))
+
+class GridIndex:
+    def __init__(self, pos, src, dst, size=None):
+        n = len(pos)
+        self.size = size or int(np.clip(np.sqrt(n / NODES_PER_CELL), 1, 1024))
+        self.low = pos.min(axis=0) if n else np.zeros(2)
+        high = pos.max(axis=0) if n else np.ones(2)
+        self.cell = np.where(high > self.low, (high - self.low) / self.size, 1)
+
+        # Nodes sorted by cell, with the start of every cell
+        self.node_cells = self.cell_ids(pos)
+        self.node_order = np.argsort(self.node_cells, kind='stable')
+        self.node_counts = np.bincount(self.node_cells, minlength=self.size * self.size)
+        self.node_starts = np.r_[0, np.cumsum(self.node_counts)]
+
+        # Edges fitting in one cell are bucketed by the cell of their lower
+        # left corner, so a query only needs to look one cell further down
+        # and left. Longer edges are checked one by one.
+        self.edge_low = np.minimum(pos[src], pos[dst])
+        self.edge_high = np.maximum(pos[src], pos[dst])
+        short = np.all(self.edge_high - self.edge_low <= self.cell, axis=1)
+        self.long_edges = np.flatnonzero(~short)
+        short_edges = np.flatnonzero(short)
+        edge_cells = self.cell_ids(self.edge_low[short_edges])
+        order = np.argsort(edge_cells, kind='stable')
+        self.edge_order = short_edges[order]
+        self.edge_starts = np.r_[0, np.cumsum(np.bincount(edge_cells, minlength=self.size * self.size))]
+
+    def cell_coordinates(self, points):
+        coordinates = np.floor((points - self.low) / self.cell).astype(np.int64)
+        return np.clip(coordinates, 0, self.size - 1)
+
+    def cell_ids(self, points):
+        coordinates = self.cell_coordinates(points)
+        return coordinates[:, 0] * self.size + coordinates[:, 1]
+
+    # Range of cells overlapping the view, as ((x0, y0), (x1, y1)) inclusive
+    def cell_range(self, xlim, ylim, grow=0):
+        corners = self.cell_coordinates(np.array([[xlim[0], ylim[0]], [xlim[1], ylim[1]]]))
+        return np.maximum(corners[0] - grow, 0), corners[1]
+
+    # Entries of the cells in the range, taken from a cell sorted order
+    def gather(self, order, starts, first, last):
+        parts = []
+        for x in range(first[0], last[0] + 1):
+            row = x * self.size
+            parts.append(order[starts[row + first[1]]:starts[row + last[1] + 1]])
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    # Cells in the view and the number of their nodes inside the view. Only
+    # the cells on the border of the range can hold nodes outside of it.
+    def visible_cells(self, pos, xlim, ylim):
+        first, last = self.cell_range(xlim, ylim)
+        xs = np.arange(first[0], last[0] + 1)
+        ys = np.arange(first[1], last[1] + 1)
+        cells = (xs[:, None] * self.size + ys[None, :]).ravel()
+        counts = self.node_counts[cells]
+        border = ((xs[:, None] == first[0]) | (xs[:, None] == last[0]) |
+                  (ys[None, :] == first[1]) | (ys[None, :] == last[1])).ravel()
+        border_cells = cells[border]
+        nodes = self.nodes_in_cells(border_cells)
+        owner = np.repeat(np.arange(len(border_cells)), self.node_counts[border_cells])
+        counts[border] = np.bincount(owner[in_view(pos[nodes], xlim, ylim)], minlength=len(border_cells))
+        return cells, counts
+
+    def nodes_in_cells(self, cells):
+        starts = self.node_starts[cells]
+        counts = self.node_starts[cells + 1] - starts
+        shift = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return self.node_order[shift + np.arange(counts.sum())]
+
+    # Edges whose bounding box overlaps the view
+    def edges_in_view(self, xlim, ylim):
+        first, last = self.cell_range(xlim, ylim, grow=1)
+        candidates = np.concatenate((self.gather(self.edge_order, self.edge_starts, first, last), self.long_edges))
+        low = self.edge_low[candidates]
+        high = self.edge_high[candidates]
+        overlap = (low[:, 0] <= xlim[1]) & (high[:, 0] >= xlim[0]) & (low[:, 1] <= ylim[1]) & (high[:, 1] >= ylim[0])
+        return candidates[overlap]
+
+class GraphViewer:
+    def __init__(self, ax, graph, pos, node_size=5, label_limit=200, max_nodes=50000, index=None):
+        self.ax = ax
+        self.graph = graph
+        self.pos = pos
+        self.label_limit = label_limit
+        self.max_nodes = max_nodes
+        self.index = index or GridIndex(pos, graph.src, graph.dst)
+        self.view = None
+        self.labels = []
+
+        size = self.index.size
+        extent = (self.index.low[0], self.index.low[0] + size * self.index.cell[0],
+                  self.index.low[1], self.index.low[1] + size * self.index.cell[1])
+        self.tiles = ax.imshow(np.full((size, size), np.nan), origin='lower', extent=extent, aspect='auto',
+                               cmap='Blues', norm=colors.LogNorm(vmin=1, vmax=max(int(self.index.node_counts.max(initial=1)), 2)),
+                               interpolation='nearest', zorder=0)
+        self.edges = ax.add_collection(LineCollection([], colors='k', linewidths=1, zorder=1), autolim=False)
+        self.nodes = ax.scatter(np.zeros(0), np.zeros(0), s=node_size, c='#1f78b4', zorder=2)
+        low, high = extent[::2], extent[1::2]
+        ax.set_xlim(low[0], high[0])
+        ax.set_ylim(low[1], high[1])
+
+        # Panning changes both limits, the redraw waits for the second one
+        self.timer = ax.figure.canvas.new_timer(interval=30)
+        self.timer.single_shot = True
+        self.timer.add_callback(self.update)
+        ax.callbacks.connect('xlim_changed', self.schedule)
+        ax.callbacks.connect('ylim_changed', self.schedule)
+        self.update()
+
+    def schedule(self, ax):
+        self.timer.stop()
+        self.timer.start()
+
+    def update(self):
+        xlim = sorted(self.ax.get_xlim())
+        ylim = sorted(self.ax.get_ylim())
+        if self.view == (xlim, ylim):
+            return
+        self.view = (xlim, ylim)
+
+        # Every visible cell gets an equal share of max_nodes, cells with more
+        # nodes in the view than their share are drawn as tiles
+        cells, counts = self.index.visible_cells(self.pos, xlim, ylim)
+        if counts.sum() <= self.max_nodes:
+            detail = cells
+        else:
+            detail = cells[counts <= self.max_nodes / len(cells)]
+        tiled = np.zeros(self.index.size * self.index.size, dtype=bool)
+        tiled[cells] = True
+        tiled[detail] = False
+
+        image = np.where(tiled & (self.index.node_counts > 0), self.index.node_counts, np.nan)
+        self.tiles.set_data(image.reshape(self.index.size, self.index.size).T)
+
+        nodes = self.index.nodes_in_cells(detail)
+        nodes = nodes[in_view(self.pos[nodes], xlim, ylim)]
+        self.nodes.set_offsets(self.pos[nodes])
+
+        # Edges are kept unless both ends are in tiled cells
+        edges = self.index.edges_in_view(xlim, ylim)
+        node_cells = self.index.node_cells
+        edges = edges[~(tiled[node_cells[self.graph.src[edges]]] & tiled[node_cells[self.graph.dst[edges]]])]
+        self.edges.set_segments(pack_segments(np.stack((self.pos[self.graph.src[edges]], self.pos[self.graph.dst[edges]]), axis=1)))
+
+        for label in self.labels:
+            label.remove()
+        self.labels = []
+        if len(nodes) <= self.label_limit and not tiled.any():
+            for key, (x, y) in zip(self.graph.ids[nodes].tolist(), self.pos[nodes].tolist()):
+                self.labels.append(self.ax.text(x, y, str(key), ha='center', va='center', zorder=3, clip_on=True))
+        self.ax.figure.canvas.draw_idle()
+
+# Checks that zooming deep into a dense cluster draws its nodes
+if __name__ == '__main__':
+    import os
+    import sys
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GraphTheory'))
+    from graph_io import Graph
+
+    rng = np.random.default_rng(0)
+    n = 1000000
+    pos = np.concatenate((rng.normal(0, 0.01, (n // 2, 2)), rng.uniform(-100, 100, (n - n // 2, 2))))
+    graph = Graph(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.arange(n))
+    fig, ax = plt.subplots()
+    viewer = GraphViewer(ax, graph, pos)
+    for radius in (1e-3, 1e-4):
+        ax.set_xlim(-radius, radius)
+        ax.set_ylim(-radius, radius)
+        viewer.update()
+        inside = int(in_view(pos, (-radius, radius), (-radius, radius)).sum())
+        drawn = len(viewer.nodes.get_offsets())
+        tiles = int(np.isfinite(np.ma.filled(viewer.tiles.get_array(), np.nan)).sum())
+        print("zoom {}: {} nodes in view, {} drawn, {} tiles".format(radius, inside, drawn, tiles))
+        assert 0 < inside <= viewer.max_nodes and drawn == inside and tiles == 0
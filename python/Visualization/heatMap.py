@@ -8,16 +8,24 @@ import matplotlib.cm as cm
 import numpy as np
 import math
 
+from csv_columns import read_columns, split_groups
+from tex_render import MODES, prepare_figure, set_tex_mode, use_tex_cache
+
 from matplotlib import rc
+
 # Sets 'global' parameters such as font, fontsize, etc.
-rc('text', usetex=True)
-rc('font', size=24, family='Times New Roman', weight='bold')
-rc('axes', labelsize=26)
-rc('xtick', labelsize=22)
-rc('ytick', labelsize=22)
-rc('legend', fontsize=22)
+def apply_style():
+    rc('text', usetex=True)
+    rc('font', size=24, family='Times New Roman', weight='bold')
+    rc('axes', labelsize=26)
+    rc('xtick', labelsize=22)
+    rc('ytick', labelsize=22)
+    rc('legend', fontsize=22)
 
 
+# Shifted colormaps built so far, by base colormap name and arguments
+shifted_cmaps = {}
+
 # This function was pulled from an online source (that I cannot find again at the moment)
 def shiftedColorMap(cmap, start=0, midpoint=0.5, stop=1.0, name='shiftedcmap'):
     '''
@@ -40,13 +48,12 @@ def shiftedColorMap(cmap, start=0, midpoint=0.5, stop=1.0, name='shiftedcmap'):
       stop : Offset from highest point in the colormap's range.
           Defaults to 1.0 (no upper offset). Should be between
           `midpoint` and 1.0.
+
+    Colormaps are built and registered once per set of arguments.
     '''
-    cdict = {
-        'red': [],
-        'green': [],
-        'blue': [],
-        'alpha': []
-    }
+    key = (cmap.name, start, midpoint, stop, name)
+    if key in shifted_cmaps:
+        return shifted_cmaps[key]
 
     # regular index to compute the colors
     reg_index = np.linspace(start, stop, 257)
@@ -57,20 +64,59 @@ def shiftedColorMap(cmap, start=0, midpoint=0.5, stop=1.0, name='shiftedcmap'):
         np.linspace(midpoint, 1.0, 129, endpoint=True)
     ])
 
-    for ri, si in zip(reg_index, shift_index):
-        r, g, b, a = cmap(ri)
-
-        cdict['red'].append((si, r, r))
-        cdict['green'].append((si, g, g))
-        cdict['blue'].append((si, b, b))
-        cdict['alpha'].append((si, a, a))
+    # All 257 colors in one call, each channel given as (x, y0, y1) rows
+    colors = cmap(reg_index)
+    cdict = {}
+    for channel, values in zip(('red', 'green', 'blue', 'alpha'), colors.T):
+        cdict[channel] = np.column_stack((shift_index, values, values))
 
     newcmap = matplotlib.colors.LinearSegmentedColormap(name, cdict)
-    plt.register_cmap(cmap=newcmap)
+    if hasattr(matplotlib, 'colormaps'):
+        matplotlib.colormaps.register(newcmap, force=True)
+    else:
+        plt.register_cmap(cmap=newcmap)
 
+    shifted_cmaps[key] = newcmap
     return newcmap
 
-def parse_arguments():
+# Edges of equal bins covering the values, equal in log space if log. With
+# no values the bins cover [0, 1] ([1, 10] if log) and stay empty.
+def bin_edges(values, bins, log=False):
+    if len(values) == 0:
+        return np.geomspace(1, 10, bins + 1) if log else np.linspace(0, 1, bins + 1)
+    lo, hi = values.min(), values.max()
+    if log:
+        if lo == hi:
+            lo, hi = lo / 2, hi * 2
+        return np.geomspace(lo, hi, bins + 1)
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    return np.linspace(lo, hi, bins + 1)
+
+# The mean, median or count of the values in every cell of the grid given by
+# the edges, as an array indexed [x bin, y bin] that is nan for empty cells
+def grid_aggregate(x, y, value, x_edges, y_edges, how='mean'):
+    nx, ny = len(x_edges) - 1, len(y_edges) - 1
+    ix = np.clip(np.searchsorted(x_edges, x, side='right') - 1, 0, nx - 1)
+    iy = np.clip(np.searchsorted(y_edges, y, side='right') - 1, 0, ny - 1)
+    cell = ix * ny + iy
+    count = np.bincount(cell, minlength=nx * ny)
+    grid = np.full(nx * ny, np.nan)
+    filled = count > 0
+    if how == 'count':
+        grid[filled] = count[filled]
+    elif how == 'mean':
+        grid[filled] = np.bincount(cell, weights=value, minlength=nx * ny)[filled] / count[filled]
+    else:
+        # Values sorted by cell then value, the middle one(s) of each cell
+        sorted_values = value[np.lexsort((value, cell))]
+        starts = np.cumsum(count) - count
+        lo = starts + (count - 1) // 2
+        hi = starts + count // 2
+        grid[filled] = (sorted_values[lo[filled]] + sorted_values[hi[filled]]) / 2
+    return grid.reshape(nx, ny)
+
+def parse_arguments(argv=None):
     parser = argparse.ArgumentParser()
 
     parser.add_argument("data_file", help="The file containing data")
@@ -93,24 +139,22 @@ def parse_arguments():
     parser.add_argument("--valueticks", nargs=1, dest='value_tick_pos', help="Positions of ticks on the colorbar. Format is a comma delimited list. e.g. 1,2,3")
     parser.add_argument("--valuelabels", nargs=1, dest='value_tick_labels', help="Labels of ticks on the colorbar. Format is a comma delimited list. e.g. 1,2,3")
     parser.add_argument("--gamma", nargs='?', dest='gamma', default=1, const=1, help="Gamma parameter to change the 'scale' of the colormap (warning: this is very 'hacky'). Default value is 1 (which produces a linear color scale) and must be > 0.")
+    parser.add_argument("--grid", nargs=1, dest='grid', help="Draw the values aggregated on a grid of NX,NY cells (or NX for both) instead of one marker per point. Bins are logarithmic with --xlog/--ylog")
+    parser.add_argument("--aggregate", choices=['mean', 'median', 'count'], default='mean', help="What the --grid cells show of the values in them")
+    parser.add_argument("--tex", choices=MODES, default='latex', help="latex: typeset every string with LaTeX, auto: only the strings mathtext cannot draw the same way, mathtext: none")
+    parser.add_argument("--tex-cache", dest='tex_cache', help="Directory where LaTeX output is cached, e.g. one shared by several machines")
+    parser.add_argument("--cache", action='store_true', help="Cache the parsed columns in .npy files next to the csv and reuse them while it is unchanged")
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
-if __name__ == '__main__':
-    args = parse_arguments()
+def main(args):
+    set_tex_mode(args.tex)
+    if args.tex_cache:
+        use_tex_cache(args.tex_cache)
     x_axis = int(args.x_axis)
     y_axis = int(args.y_axis)
     value_index = int(args.value)
 
-    x_data = {}
-    y_data = {}
-    value_data = {}
-
-    if not args.group:
-        x_data = {'default' : []}
-        y_data = {'default' : []}
-        value_data = {'default' : []}
-
     # Set tick positions and labels
     if args.y_tick_pos:
         y_tick_pos = [float(s) for s in args.y_tick_pos[0].split(',')]
@@ -137,35 +181,30 @@ if __name__ == '__main__':
     else:
         value_tick_labels = None
 
-    header = None 
-    with open(args.data_file) as input_file:
-        for line in input_file:
-            if header:
-                line = line.split(',')
-                x_value = float(line[x_axis])
-                y_value = float(line[y_axis])
-                if 'X' in line[value_index] or 'x' in line[value_index]:
-                    #value = np.nan
-                    value = 0
-                    continue
-                else:
-                    value = float(line[value_index])
-
-                if args.group:
-                    group = line[int(args.group[0])].strip()
-                    if group not in x_data:
-                        x_data[group] = []
-                        y_data[group] = []
-                        value_data[group] = []
-                    x_data[group].append(x_value)
-                    y_data[group].append(y_value)
-                    value_data[group].append(value)
-                else:
-                    x_data['default'].append(x_value)
-                    y_data['default'].append(y_value)
-                    value_data['default'].append(value)
-            else:
-                header = line.split(',')
+    # Rows whose value is marked with an X are skipped
+    if args.group:
+        columns, kinds = [x_axis, y_axis, value_index, int(args.group[0])], ['float', 'float', 'str', 'group']
+    else:
+        columns, kinds = [x_axis, y_axis, value_index], ['float', 'float', 'str']
+    header, values = read_columns(args.data_file, columns, kinds, cache=args.cache)
+    x_values, y_values, value_text = values[:3]
+    keep = (np.char.find(value_text, 'X') < 0) & (np.char.find(value_text, 'x') < 0)
+    if args.group:
+        group_labels, group_codes = values[3]
+    else:
+        group_labels, group_codes = ['default'], np.zeros(len(keep), dtype=np.int64)
+
+    x_kept, y_kept, value_kept = x_values[keep], y_values[keep], value_text[keep].astype(float)
+
+    x_data = {}
+    y_data = {}
+    value_data = {}
+    groups = split_groups(group_codes[keep], len(group_labels), x_kept, y_kept, value_kept)
+    for group, (x, y, value) in zip(group_labels, groups):
+        if len(x) or not args.group:
+            x_data[group] = x
+            y_data[group] = y
+            value_data[group] = value
 
     print("x:",header[x_axis])
     print("y:",header[y_axis].strip())
@@ -183,20 +222,39 @@ if __name__ == '__main__':
     if args.xlog:
         plt.xscale('log')
 
+    orig_cmap = matplotlib.cm.RdYlGn_r
+    shifted_cmap = shiftedColorMap(orig_cmap, start=0.0, midpoint=0.5, name='my_shifted')
+
     # Plot the data
-    for group in sorted(x_data.keys()): 
-        print(group)
-        x = np.array(x_data[group])
-        y = np.array(y_data[group])
-        value = np.array(value_data[group])
-
-        orig_cmap = matplotlib.cm.RdYlGn_r
-        shifted_cmap = shiftedColorMap(orig_cmap, start=0.0, midpoint=0.5, name='my_shifted')
-        line = plt.scatter(x,y,c=value, 
-                cmap=orig_cmap,
-                s=200, marker=next(markers), label=group, norm=matplotlib.colors.PowerNorm(gamma=float(args.gamma)))
-        plt.clim(0,1)
-        lines.append(line)
+    if args.grid:
+        # All groups in one grid, points off a log axis are dropped
+        bins = [int(b) for b in args.grid[0].split(',')]
+        on_axes = np.ones(len(x_kept), dtype=bool)
+        if args.xlog:
+            on_axes &= x_kept > 0
+        if args.ylog:
+            on_axes &= y_kept > 0
+        x, y, value = x_kept[on_axes], y_kept[on_axes], value_kept[on_axes]
+        x_edges = bin_edges(x, bins[0], args.xlog)
+        y_edges = bin_edges(y, bins[-1], args.ylog)
+        grid = grid_aggregate(x, y, value, x_edges, y_edges, args.aggregate)
+        mesh = plt.pcolormesh(x_edges, y_edges, np.ma.masked_invalid(grid.T), cmap=orig_cmap,
+                norm=matplotlib.colors.PowerNorm(gamma=float(args.gamma)))
+        if args.aggregate != 'count':
+            plt.clim(0,1)
+        lines.append(mesh)
+    else:
+        for group in sorted(x_data.keys()): 
+            print(group)
+            x = x_data[group]
+            y = y_data[group]
+            value = value_data[group]
+
+            line = plt.scatter(x,y,c=value, 
+                    cmap=orig_cmap,
+                    s=200, marker=next(markers), label=group, norm=matplotlib.colors.PowerNorm(gamma=float(args.gamma)))
+            plt.clim(0,1)
+            lines.append(line)
 
     cbar = plt.colorbar(lines[0],orientation='horizontal', norm=matplotlib.colors.PowerNorm(gamma=0.25), spacing='uniform', pad=0.2)
     cbar.ax.set_xlabel(args.value_title, rotation=0, labelpad=15)
@@ -214,13 +272,15 @@ if __name__ == '__main__':
         plt.xticks(x_tick_pos, x_tick_labels)
     plt.gca().get_yaxis().set_minor_formatter(tick.NullFormatter())
 
-    if args.legend:
+    if args.legend and not args.grid:
         plt.legend(bbox_to_anchor=(1,0.5), loc='center left', frameon=True)
 
     plt.gca().set_facecolor('white')
     plt.gca().grid(True)
     plt.gca().set_axisbelow(True)
 
+    prepare_figure(plt.gcf(), args.tex)
+
     # Display or save chart (NOTE: The default view of displaying the chart is different than how it is saved)
     if not args.fig_name:
         plt.tight_layout()
@@ -228,3 +288,7 @@ if __name__ == '__main__':
     else:
         print(args.fig_name[0])
         plt.savefig(args.fig_name[0], bbox_inches='tight', dpi=1000, format='pdf')
+
+if __name__ == '__main__':
+    apply_style()
+    main(parse_arguments())
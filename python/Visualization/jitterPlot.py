@@ -9,7 +9,13 @@ import numpy as np
 import math
 import seaborn as sns
 
-def parse_arguments():
+from csv_columns import read_series
+
+# Uses the default style
+def apply_style():
+    pass
+
+def parse_arguments(argv=None):
     parser = argparse.ArgumentParser()
 
     parser.add_argument("data_file", help="The file containing data")
@@ -30,11 +36,11 @@ def parse_arguments():
     parser.add_argument("--xmin", nargs=1, dest='x_min', type=float, help="minimum of x axis")
     parser.add_argument("--xmax", nargs=1, dest='x_max', type=float, help="maximum of x axis")
     parser.add_argument("--skip_iter", nargs=1, dest='skip_iter', type=int, default=[0], help="maximum of x axis")
+    parser.add_argument("--cache", action='store_true', help="Cache the parsed columns in .npy files next to the csv and reuse them while it is unchanged")
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
-if __name__ == '__main__':
-    args = parse_arguments()
+def main(args):
     group_index = int(args.group)
     x_axis = int(args.x_axis)
     y_axes = [int(y) for y in args.y_axis.split(',')]
@@ -49,39 +55,11 @@ if __name__ == '__main__':
 
     y_labels= [y for y in args.y_labels.split(',')]
     axes = []
-    data = {}
-
-    header = None 
-    with open(args.data_file) as input_file:
-        for line in input_file:
-            if header:
-                line = line.split(',')
-                group = line[group_index]
-                if group not in data:
-                    data[group] = {'x':[]}
-                    if args.error:
-                        data[group]['error'] = {} 
-                    for y in y_axes:
-                        data[group][y] = []
-                        data[group]['label'] = []
-                        if args.error:
-                            data[group]['error'][y] = []
-
-                data[group]['x'].append(float(line[x_axis]))
-                index = 0
-                for y in y_axes:
-                    y_value = float(line[y])
-                    data[group][y].append(float(line[y]))
-                    if args.error:
-                        error_value = float(line[error_index[y]])
-                        if error_value > y_value:
-                            error_value = 0.999 * y_value
-                        data[group]['error'][y].append(error_value)
-                    index += 1
-            else:
-                header = line.split(',')
+
+    header, data = read_series(args.data_file, group_index, x_axis, y_axes, error_index, cache=args.cache)
 
     for group in data:
+        data[group]['label'] = []
         for y in y_axes:
             data[group]['label'].append(header[y])
 
@@ -135,15 +113,15 @@ if __name__ == '__main__':
             if args.y_min:
                 minys[index] = args.y_min[0]
             else:
-                temp_min = min(data[group][y])
+                temp_min = data[group][y].min()
                 if temp_min < minys[index]:
                     minys[index] = temp_min
             if args.y_max:
                 maxys[index] = args.y_max[0]
             else:
-                temp_max = max(data[group][y])
+                temp_max = data[group][y].max()
                 if args.error:
-                    temp_max += max(data[group]['error'][y])
+                    temp_max += data[group]['error'][y].max()
                 if temp_max > maxys[index]:
                     maxys[index] = temp_max
             if len(y_labels) > 1:
@@ -152,13 +130,13 @@ if __name__ == '__main__':
         if args.x_max:
             maxx = args.x_max[0]
         else:
-            temp_max = max(data[group]['x'])
+            temp_max = data[group]['x'].max()
             if temp_max > maxx:
                 maxx = temp_max
         if args.x_min:
             minx = args.x_min[0]
         else:
-            temp_min = min(data[group]['x'])
+            temp_min = data[group]['x'].min()
             if temp_min < minx:
                 minx = temp_min
 
@@ -173,3 +151,7 @@ if __name__ == '__main__':
     else:
         print(args.fig_name[0])
         plt.savefig(args.fig_name[0], bbox_inches='tight', dpi=1000, format='pdf')
+
+if __name__ == '__main__':
+    apply_style()
+    main(parse_arguments())
@@ -1,6 +1,7 @@
 #! /usr/bin/env python
 import argparse
-import networkx as nx
+import functools
+import itertools
 import matplotlib
 matplotlib.rcParams.update({'errorbar.capsize': 20, 'lines.linewidth':2})
 import matplotlib.pyplot as plt
@@ -8,6 +9,13 @@ import matplotlib.ticker as tick
 import matplotlib.cm as cm
 import numpy as np
 import math
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GraphTheory'))
+from graph_io import FORMATS, read_graph
+from running_stats import HistogramStats
 
 def parse_arguments():
     parser = argparse.ArgumentParser()
@@ -16,51 +24,163 @@ def parse_arguments():
     parser.add_argument("list", help="List of groups")
     parser.add_argument("direct", help="directory")
     parser.add_argument("xlims", help="xlims")
+    parser.add_argument("--jobs", help="number of worker processes reading the graphs (0 uses every core)", type=int, default=1, dest="jobs")
+    parser.add_argument("--mode", help="dense: mean count of every degree, log: mean count per vertex and degree in logarithmic bins, ccdf: fraction of the vertices of all graphs with at least each degree", choices=['dense', 'log', 'ccdf'], default='dense', dest="mode")
+    parser.add_argument("--log-base", help="ratio between the edges of consecutive --mode log bins", type=float, default=2, dest="log_base")
+    parser.add_argument("--format", help="format of the graph files (default: detected from the extension and contents)", choices=['auto'] + FORMATS, default='auto', dest="graph_format")
+    parser.add_argument("--save_data", dest='data_name', help="Write the plotted series to this csv file")
     parser.add_argument("--save_fig", nargs=1, dest='fig_name', help="Use log scale for y-axis")
 
     return parser.parse_args()
 
-def get_degree_dist(graph_file_name):
-    degrees = {}
-    with open(graph_file_name, 'r') as graph_file:
-        for line in graph_file:
-            if '#' not in line:
-                line = line.strip('\n')
-                if len(line) > 0:
-                    u, v = [int(x) for x in line.split()]
-                    if u not in degrees:
-                        degrees[u] = 0
-                    if v not in degrees:
-                        degrees[v] = 0
-                    degrees[u] += 1
-                    degrees[v] += 1
-    V = max(degrees)
-    distribution = [0 for i in range(V + 1)]
-    for v in degrees:
-        distribution[degrees[v]] += 1
+# Degree of every vertex of the graph, O(V) whatever the ids, and the
+# largest vertex id
+def get_degrees(graph_file_name, graph_format='auto'):
+    graph = read_graph(graph_file_name, graph_format)
+    degrees = np.bincount(np.concatenate((graph.src, graph.dst)), minlength=graph.n)
+    return degrees, int(graph.ids.max()) if graph.n else -1
+
+# Number of vertices of every degree >= 1, as long as the largest vertex id
+# when that is larger
+def get_degree_dist(graph_file_name, graph_format='auto'):
+    degrees, V = get_degrees(graph_file_name, graph_format)
+    distribution = np.bincount(degrees[degrees > 0], minlength=V + 1)
     return distribution 
 
+# Distinct degrees and the number of vertices with each, leaving out
+# vertices without edges as the dense distribution does
+def get_degree_counts(graph_file_name, graph_format='auto'):
+    degrees, _ = get_degrees(graph_file_name, graph_format)
+    degrees = np.sort(degrees[degrees > 0])
+    starts = np.flatnonzero(np.r_[True, degrees[1:] != degrees[:-1]])
+    return degrees[starts], np.diff(np.r_[starts, len(degrees)])
+
+# Integer edges of the logarithmic degree bins: 1 and the distinct values
+# of ceil(base^k), so bin k holds the degrees in [edge k, edge k+1)
+def iter_log_bin_edges(base=2):
+    edge, power = 1, 1.0
+    while True:
+        yield edge
+        while math.ceil(power) <= edge:
+            power *= base
+        edge = math.ceil(power)
+
+# Edges of the bins up to the one holding max_degree
+def log_bin_edges(max_degree, base=2):
+    edges = []
+    for edge in iter_log_bin_edges(base):
+        edges.append(edge)
+        if edge > max_degree:
+            return np.array(edges, dtype=np.int64)
+
+# Number of vertices in every logarithmic degree bin
+def get_log_binned_dist(graph_file_name, base=2, graph_format='auto'):
+    values, counts = get_degree_counts(graph_file_name, graph_format)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    bins = np.searchsorted(log_bin_edges(values[-1], base), values, side='right') - 1
+    return np.bincount(bins, weights=counts).astype(np.int64)
+
+# Vertex counts of every distinct degree summed over many graphs, held as
+# sorted sparse arrays
+class DegreeCounts:
+    def __init__(self):
+        self.values = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, values, counts):
+        if len(values) == 0:
+            return
+        values = np.concatenate((self.values, values))
+        counts = np.concatenate((self.counts, counts))
+        order = np.argsort(values, kind='stable')
+        values, counts = values[order], counts[order]
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+        self.values = values[starts]
+        self.counts = np.add.reduceat(counts, starts)
+
+    def merge(self, other):
+        self.add(other.values, other.counts)
+
+    # Fraction of the vertices with degree at least each distinct degree
+    def ccdf(self):
+        tail = np.cumsum(self.counts[::-1])[::-1]
+        return self.values, tail / max(self.counts.sum(), 1)
+
+# Degree distribution statistics of a slice of the graph list
+def distribution_stats(graph_file_names, mode='dense', log_base=2, graph_format='auto'):
+    if mode == 'ccdf':
+        stats = DegreeCounts()
+        for graph_file_name in graph_file_names:
+            stats.add(*get_degree_counts(graph_file_name, graph_format))
+        return stats
+    stats = HistogramStats()
+    for graph_file_name in graph_file_names:
+        if mode == 'log':
+            stats.add(get_log_binned_dist(graph_file_name, log_base, graph_format))
+        else:
+            stats.add(get_degree_dist(graph_file_name, graph_format))
+    return stats
+
+# Every worker aggregates an interleaved slice of the list and the partial
+# statistics are merged, giving the same result as a single process. Every
+# graph counts in every log bin, with no vertices in the bins past its
+# largest degree.
+def compute_distribution_stats(graph_file_names, jobs=1, mode='dense', log_base=2, graph_format='auto'):
+    work = functools.partial(distribution_stats, mode=mode, log_base=log_base, graph_format=graph_format)
+    if jobs == 1:
+        stats = work(graph_file_names)
+    else:
+        jobs = jobs or os.cpu_count()
+        slices = [graph_file_names[i::jobs * 4] for i in range(jobs * 4)]
+        stats = DegreeCounts() if mode == 'ccdf' else HistogramStats()
+        with multiprocessing.Pool(jobs) as pool:
+            for partial in pool.imap_unordered(work, slices):
+                stats.merge(partial)
+    if mode == 'log':
+        stats.pad()
+    return stats
+
+def write_data(data_name, header, columns):
+    with open(data_name, 'w') as out_file:
+        out_file.write(header + "\n")
+        np.savetxt(out_file, np.column_stack(columns), fmt='%.10g', delimiter=',')
+
 if __name__ == '__main__':
     args = parse_arguments()
+    if args.log_base <= 1:
+        sys.exit("--log-base must be greater than 1")
     list_file = args.list
-    sums = {}
-    count = 0
     with open (list_file, 'r') as graph_list:
-        for line in graph_list:
-            count += 1
-            line = line.strip()
-            dist = get_degree_dist(args.direct + "/" + line)
-            for i in range(len(dist)):
-                if i not in sums:
-                    sums[i] = []
-                sums[i].append(dist[i])
-    avg_dist = [np.mean(sums[s]) for s in sorted(sums.keys())]
-    errors = [np.std(sums[s], ddof=1) for s in sorted(sums.keys())]
+        graph_file_names = [args.direct + "/" + line.strip() for line in graph_list]
+    stats = compute_distribution_stats(graph_file_names, args.jobs, args.mode, args.log_base, args.graph_format)
     ax = plt.subplot(111)
-    #ax.bar(list(range(len(avg_dist))),avg_dist,align='center', yerr=errors)
-    ax.bar(list(range(len(avg_dist))),avg_dist,align='center')
-    ax.set_xlim([int(x) for x in args.xlims.split(',')])
-
+    if args.mode == 'ccdf':
+        degrees, ccdf = stats.ccdf()
+        ax.step(degrees, ccdf, where='post')
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        if args.data_name:
+            write_data(args.data_name, "degree,ccdf", (degrees, ccdf))
+    elif args.mode == 'log':
+        # Mean number of vertices per degree in every bin
+        edges = np.array(list(itertools.islice(iter_log_bin_edges(args.log_base), len(stats.count) + 1)))
+        widths = np.diff(edges)
+        avg_dist = stats.mean() / widths
+        errors = stats.std() / widths
+        ax.bar(edges[:-1], avg_dist, width=widths, align='edge')
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        if args.data_name:
+            write_data(args.data_name, "bin_start,bin_end,mean,std", (edges[:-1], edges[1:] - 1, avg_dist, errors))
+    else:
+        avg_dist = stats.mean()
+        errors = stats.std()
+        #ax.bar(list(range(len(avg_dist))),avg_dist,align='center', yerr=errors)
+        ax.bar(list(range(len(avg_dist))),avg_dist,align='center')
+        if args.data_name:
+            write_data(args.data_name, "degree,mean,std", (np.arange(len(avg_dist)), avg_dist, errors))
+    ax.set_xlim([float(x) for x in args.xlims.split(',')])
     if not args.fig_name:
         plt.show()
     else:
@@ -4,6 +4,9 @@ import argparse
 import itertools
 import matplotlib.pyplot as plt
 import matplotlib.ticker as tick
+import numpy as np
+
+from csv_columns import factorize, read_columns, split_groups
 
 def parse_arguments():
     parser = argparse.ArgumentParser()
@@ -23,6 +26,7 @@ def parse_arguments():
     parser.add_argument('--y1_box', help="y1 is supposed to be a box plot", action='store_true')
     parser.add_argument('--x1_multi', help="x1 is supposed to be multiseries", action='store_true')
     parser.add_argument('save_fig', help="Figure filename")
+    parser.add_argument("--cache", action='store_true', help="Cache the parsed columns in .npy files next to the csv and reuse them while it is unchanged")
 
     return parser.parse_args()
 
@@ -36,24 +40,13 @@ if __name__ == '__main__':
     x_label_2 = int(args.x2_label)
     y_label_1 = int(args.y1_label)
     y_label_2 = int(args.y2_label)
-    y1 = []
-    y2 = []
-    x1 = []
-    x2 = []
-    header = None 
-    with open(args.data) as input_file:
-        for line in input_file:
-            line = line.strip('\n')
-            if not header:
-                header = line.split(',')
-                continue
-            line = line.split(',')
-            if '_' not in line[x_field_1]:
-                x1.append(float(line[x_field_1]))
-                y1.append(float(line[y_field_1]))
-            elif '_' not in line[x_field_2]:
-                x2.append(float(line[x_field_2]))
-                y2.append(float(line[y_field_2]))
+    # Rows go to the first series, or to the second when their x1 field
+    # contains '_' (unless their x2 field does too)
+    header, (x1, y1, x2, y2) = read_columns(args.data, [x_field_1, y_field_1, x_field_2, y_field_2], ['str'] * 4, cache=args.cache)
+    first = np.char.find(x1, '_') < 0
+    second = ~first & (np.char.find(x2, '_') < 0)
+    x1, y1 = x1[first].astype(float), y1[first].astype(float)
+    x2, y2 = x2[second].astype(float), y2[second].astype(float)
 
     marker = itertools.cycle(('o', '*', '^', '+'))
     color = itertools.cycle(('r', 'g', 'b', 'c', 'p'))
@@ -65,15 +58,11 @@ if __name__ == '__main__':
     plot_params ={}
     plot_params['linestyle'] = 'None'
     if args.y1_box:
-        data = {x:[] for x in x1}
-        positions = [x for x in data]
-        for i in range(len(x1)):
-            data[x1[i]].append(y1[i])
+        positions, codes = factorize(x1)
+        dataset = [values for values, in split_groups(codes, len(positions), y1)]
+        data = dict(zip(positions.tolist(), dataset))
         print('Boxplot data:', data)
         print('Postions:',positions)
-        dataset = []
-        for d in data:
-            dataset.append(data[d])
         ax1.boxplot(dataset, positions=positions)
     else:
         ax1.plot(x1, y1, marker=next(marker), color="C0", label=header[x_field_1], **plot_params)
@@ -83,10 +72,10 @@ if __name__ == '__main__':
     ax2.plot(x2, y2, marker=next(marker), color="C0", label=header[x_field_2], **plot_params)
 
     if args.same_x:
-        minx1 = min(x1)
-        minx2 = min(x2)
-        maxx1 = max(x1)
-        maxx2 = max(x2)
+        minx1 = x1.min()
+        minx2 = x2.min()
+        maxx1 = x1.max()
+        maxx2 = x2.max()
         x_lims = [min(0, minx1, minx2), max(maxx1, maxx2)]
         ax1.set_xlim(x_lims)
         ax2.set_xlim(x_lims)
@@ -96,10 +85,10 @@ if __name__ == '__main__':
         ax2.xaxis.set_label_position('top')
 
     if args.same_y:
-        miny1 = min(y1)
-        miny2 = min(y2)
-        maxy1 = max(y1)
-        maxy2 = max(y2)
+        miny1 = y1.min()
+        miny2 = y2.min()
+        maxy1 = y1.max()
+        maxy2 = y2.max()
         y_lims = [min(0, miny1, miny2), max(maxy1, maxy2)]
         ax1.set_ylim(y_lims)
         ax2.set_ylim(y_lims)
@@ -5,6 +5,8 @@ import itertools
 import matplotlib.pyplot as plt
 import matplotlib.ticker as tick
 
+from csv_columns import read_columns
+
 def parse_arguments():
     parser = argparse.ArgumentParser()
 
@@ -18,6 +20,7 @@ def parse_arguments():
     parser.add_argument('y1_label', help="The field(s) to use as y axis 1")
     parser.add_argument('y2_label', help="The field(s) to use as y axis 2")
     parser.add_argument('save_fig', help="Figure filename")
+    parser.add_argument("--cache", action='store_true', help="Cache the parsed columns in .npy files next to the csv and reuse them while it is unchanged")
 
     return parser.parse_args()
 
@@ -27,22 +30,11 @@ if __name__ == '__main__':
     y_field_1 = [int(y) for y in args.y_axis1.split(',')]
     y_field_2 = [int(y) for y in args.y_axis2.split(',')]
     title = args.title.strip()
-    y1 = {i:[] for i in y_field_1}
-    y2 = {i:[] for i in y_field_2}
-    x = []
-    header = None 
-    with open(args.data) as input_file:
-        for line in input_file:
-            line = line.strip('\n')
-            if not header:
-                header = line.split(',')
-                continue
-            line = line.split(',')
-            x.append(int(line[x_field]))
-            for i in y_field_1:
-                y1[i].append(float(line[i]))
-            for i in y_field_2:
-                y2[i].append(float(line[i]))
+    columns = [x_field] + y_field_1 + y_field_2
+    header, values = read_columns(args.data, columns, ['int'] + ['float'] * (len(columns) - 1), cache=args.cache)
+    x = values[0]
+    y1 = dict(zip(y_field_1, values[1:1 + len(y_field_1)]))
+    y2 = dict(zip(y_field_2, values[1 + len(y_field_1):]))
 
     marker = itertools.cycle(('+', '^', 'o', '*'))
     color = itertools.cycle(('r', 'g', 'b', 'c', 'p'))
@@ -54,8 +46,8 @@ if __name__ == '__main__':
         ax1.plot(x, y1[y], marker=next(marker), color=next(color), label=header[y])
     for y in y2:
         ax2.plot(x, y2[y], marker=next(marker), color=next(color), label=header[y])
-        temp_min = min(y2[y])
-        temp_max = max(y2[y])
+        temp_min = y2[y].min()
+        temp_max = y2[y].max()
         if temp_min < miny2:
             miny2 = temp_min
         if temp_max > maxy2:
@@ -67,7 +59,7 @@ if __name__ == '__main__':
     ax2.set_yscale('log')
 
     # Set ticks
-    x_lims = [min(x) - min(x)/4, max(x) + max(x)/4]
+    x_lims = [x.min() - x.min()/4, x.max() + x.max()/4]
 
     ax1.plot(x_lims, [0, 0], '-', dashes=[8,2])
     ax1.set_xlim(x_lims)
@@ -8,18 +8,69 @@ import matplotlib.cm as cm
 import numpy as np
 import math
 
+from csv_columns import read_series
+from tex_render import MODES, prepare_figure, set_tex_mode, use_tex_cache
+
 from matplotlib import rc
+from matplotlib.lines import Line2D
+
 # Sets 'global' parameters such as font, fontsize, etc.
-rc('errorbar', capsize=5)
-rc('lines', linewidth=2)
-rc('text', usetex=True)
-rc('font', size=24, family='Times New Roman', weight='bold')
-rc('axes', labelsize=26)
-rc('xtick', labelsize=22)
-rc('ytick', labelsize=22)
-rc('legend', fontsize=20)
-
-def parse_arguments():
+def apply_style():
+    rc('errorbar', capsize=5)
+    rc('lines', linewidth=2)
+    rc('text', usetex=True)
+    rc('font', size=24, family='Times New Roman', weight='bold')
+    rc('axes', labelsize=26)
+    rc('xtick', labelsize=22)
+    rc('ytick', labelsize=22)
+    rc('legend', fontsize=20)
+
+# Range of an axis covering the values with a 5% margin on each side, on
+# the log10 of the values for a log axis (where values <= 0 are dropped)
+def canvas_range(values, log=False):
+    values = values[np.isfinite(values)]
+    if log:
+        values = np.log10(values[values > 0])
+    if len(values) == 0:
+        return (0.0, 1.0)
+    lo, hi = values.min(), values.max()
+    margin = (hi - lo) * 0.05 or 0.5
+    return (lo - margin, hi + margin)
+
+# Number of points falling in every pixel of a width x height canvas
+# spanning x_range and y_range (see canvas_range)
+def point_canvas(x, y, x_range, y_range, shape, xlog=False, ylog=False):
+    width, height = shape
+    keep = np.isfinite(x) & np.isfinite(y)
+    if xlog:
+        keep &= x > 0
+    if ylog:
+        keep &= y > 0
+    x, y = x[keep], y[keep]
+    if xlog:
+        x = np.log10(x)
+    if ylog:
+        y = np.log10(y)
+    column = ((x - x_range[0]) / (x_range[1] - x_range[0]) * width).astype(np.int64)
+    row = ((y - y_range[0]) / (y_range[1] - y_range[0]) * height).astype(np.int64)
+    np.clip(column, 0, width - 1, out=column)
+    np.clip(row, 0, height - 1, out=row)
+    return np.bincount(row * width + column, minlength=width * height).reshape(height, width)
+
+# One RGBA image from the canvases of several series: every pixel has the
+# colors of the series in it weighted by their counts, and an opacity that
+# grows with the log of its total count
+def composite_canvases(canvases, colors):
+    counts = np.stack(canvases).astype(float)
+    total = counts.sum(axis=0)
+    rgb = np.tensordot(counts, np.asarray(colors)[:, :3], axes=(0, 0)) / np.maximum(total, 1)[..., None]
+    alpha = np.zeros(total.shape)
+    filled = total > 0
+    if filled.any():
+        alpha[filled] = 0.35 + 0.65 * np.log1p(total[filled]) / np.log1p(total.max())
+    return np.dstack((rgb, alpha))
+
+def parse_arguments(argv=None):
     parser = argparse.ArgumentParser()
 
     parser.add_argument("data_file", help="The csv file containing data")
@@ -40,11 +91,17 @@ def parse_arguments():
     parser.add_argument("--ylabels", nargs=1, dest='y_tick_labels', help="Labels of ticks on y-axis. Format is a comma delimited list. e.g. 1,2,3")
     parser.add_argument("--xticks", nargs=1, dest='x_tick_pos', help="Positions of ticks on x-axis. Format is a comma delimited list. e.g. 1,2,3")
     parser.add_argument("--xlabels", nargs=1, dest='x_tick_labels', help="Labels of ticks on x-axis. Format is a comma delimited list. e.g. 1,2,3")
+    parser.add_argument("--raster", nargs='?', dest='raster', const='600,500', help="Draw the points of each axis as one image of WIDTH,HEIGHT pixels (or WIDTH for both, default 600,500) counting the points per pixel, for very large files. Error bars are not drawn")
+    parser.add_argument("--tex", choices=MODES, default='latex', help="latex: typeset every string with LaTeX, auto: only the strings mathtext cannot draw the same way, mathtext: none")
+    parser.add_argument("--tex-cache", dest='tex_cache', help="Directory where LaTeX output is cached, e.g. one shared by several machines")
+    parser.add_argument("--cache", action='store_true', help="Cache the parsed columns in .npy files next to the csv and reuse them while it is unchanged")
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
-if __name__ == '__main__':
-    args = parse_arguments()
+def main(args):
+    set_tex_mode(args.tex)
+    if args.tex_cache:
+        use_tex_cache(args.tex_cache)
 
     # Process arguments, not the most elegant way of doing this
     use_jitter = args.jitter
@@ -62,37 +119,9 @@ if __name__ == '__main__':
 
     y_titles = [y for y in args.y_titles.split(',')]
     axes = []
-    data = {}
 
     # Extract the data
-    header = None 
-    with open(args.data_file) as input_file:
-        for line in input_file:
-            if header:
-                line = line.split(',')
-                group = line[group_index]
-                if group not in data:
-                    data[group] = {'x':[]}
-                    if args.error:
-                        data[group]['error'] = {} 
-                    for y in y_axes:
-                        data[group][y] = []
-                        if args.error:
-                            data[group]['error'][y] = []
-
-                data[group]['x'].append(float(line[x_axis]))
-                index = 0
-                for y in y_axes:
-                    y_value = float(line[y])
-                    data[group][y].append(float(line[y]))
-                    if args.error:
-                        error_value = float(line[error_index[y]])
-                        if error_value > y_value:
-                            error_value = 0.999 * y_value
-                        data[group]['error'][y].append(error_value)
-                    index += 1
-            else:
-                header = line.split(',')
+    header, data = read_series(args.data_file, group_index, x_axis, y_axes, error_index, cache=args.cache)
 
     if args.y_tick_pos:
         y_tick_pos = [float(s) for s in args.y_tick_pos[0].split(',')]
@@ -130,6 +159,8 @@ if __name__ == '__main__':
 
     lines = []
     labels = []
+    # For --raster, the (x, y, color) of every series drawn on each axis
+    raster_series = [[] for ax in axes]
 
     # Print information for debugging
     print("group:",header[group_index])
@@ -167,12 +198,17 @@ if __name__ == '__main__':
                 plot_params['label'] = group.strip()
 
             line = None
-            jittered_x = [x + jitter_incr for x in data[group]['x']]
-            line, = axes[index].plot(jittered_x, data[group][y], **plot_params)
+            jittered_x = data[group]['x'] + jitter_incr
+            if args.raster:
+                # Only a legend entry, the points go into the axis' image
+                line = Line2D([], [], **plot_params)
+                raster_series[index].append((jittered_x, data[group][y], matplotlib.colors.to_rgba(plot_params['color'])))
+            else:
+                line, = axes[index].plot(jittered_x, data[group][y], **plot_params)
             if use_jitter:
                 jitter_incr += 0.015
 
-            if args.error:
+            if args.error and not args.raster:
                 _, caps, _ = axes[index].errorbar(jittered_x, data[group][y], yerr=data[group]['error'][y], fmt='', capsize=5, color = plot_params['color'], linestyle='')
                 for cap in caps:
                     cap.set_markeredgewidth(1)
@@ -184,6 +220,23 @@ if __name__ == '__main__':
                 index += 1
     fig.suptitle(args.title)
 
+    # Each axis gets one image, placed in axes coordinates since images are
+    # stretched linearly in data coordinates, which is wrong on a log axis
+    if args.raster:
+        sizes = [int(s) for s in args.raster.split(',')]
+        shape = (sizes[0], sizes[-1])
+        x_range = canvas_range(np.concatenate([x for series in raster_series for x, y, color in series]), args.xlog)
+        for i in range(len(axes)):
+            if not raster_series[i]:
+                continue
+            y_range = canvas_range(np.concatenate([y for x, y, color in raster_series[i]]), args.ylog)
+            canvases = [point_canvas(x, y, x_range, y_range, shape, args.xlog, args.ylog) for x, y, color in raster_series[i]]
+            image = composite_canvases(canvases, [color for x, y, color in raster_series[i]])
+            axes[i].imshow(image, extent=(0, 1, 0, 1), transform=axes[i].transAxes, origin='lower',
+                           interpolation='none', aspect='auto')
+            axes[i].set_xlim([10 ** v for v in x_range] if args.xlog else x_range)
+            axes[i].set_ylim([10 ** v for v in y_range] if args.ylog else y_range)
+
     # Set axis titles, tick positions/labels, etc.
     for i in range(len(axes)):
         axes[i].set_xlabel(r"{}".format(args.x_title))
@@ -215,6 +268,8 @@ if __name__ == '__main__':
     axes[0].set_facecolor('white')
     axes[0].grid(True)
 
+    prepare_figure(fig, args.tex)
+
     # Display or save chart (NOTE: The default view of displaying the chart is different than how it is saved)
     if not args.fig_name:
         plt.tight_layout()
@@ -222,3 +277,7 @@ if __name__ == '__main__':
     else:
         print(args.fig_name[0])
         plt.savefig(args.fig_name[0], bbox_inches='tight', dpi=1000, format='pdf')
+
+if __name__ == '__main__':
+    apply_style()
+    main(parse_arguments())
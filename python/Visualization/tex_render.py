@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+
+# Text modes for the figures that are typeset with LaTeX (usetex).
+#
+#   latex     every string goes through LaTeX, as rc('text', usetex=True)
+#   auto      strings mathtext draws the same way are drawn by mathtext and
+#             only the others go through LaTeX
+#   mathtext  no string goes through LaTeX
+#
+# Matplotlib keeps what LaTeX produced in a cache directory (tex.cache in
+# its cache dir) keyed by the string, font and size, so a string is only
+# typeset once across runs and processes. use_tex_cache moves that cache,
+# e.g. to a directory shared by every machine drawing the figures.
+#
+# auto and mathtext set the text in Computer Modern like LaTeX does, so
+# strings drawn either way look alike.
+
+import functools
+import os
+import pathlib
+import re
+
+import matplotlib
+from matplotlib import rc
+from matplotlib.mathtext import MathTextParser
+from matplotlib.texmanager import TexManager
+from matplotlib.text import Text
+
+MODES = ['latex', 'auto', 'mathtext']
+
+# Characters that mean something to LaTeX outside of math mode
+LATEX_TEXT = re.compile(r'[\\{}^_~%&#]')
+
+PARSER = MathTextParser('path')
+
+# Whether a string needs LaTeX to look the way it does with usetex
+@functools.lru_cache(maxsize=None)
+def needs_latex(text):
+    parts = re.split(r'(?<!\\)\$', text)
+    if len(parts) % 2 == 0:
+        return True
+    if any(LATEX_TEXT.search(part) for part in parts[::2]):
+        return True
+    for math in parts[1::2]:
+        try:
+            PARSER.parse('$' + math + '$')
+        except ValueError:
+            return True
+    return False
+
+def use_tex_cache(directory):
+    os.makedirs(directory, exist_ok=True)
+    directory = os.path.abspath(directory)
+    # The attribute was renamed in matplotlib 3.7
+    if hasattr(TexManager, '_cache_dir'):
+        TexManager._cache_dir = pathlib.Path(directory)
+    else:
+        TexManager.texcache = directory
+
+# Sets the rc parameters of a mode, after the script's own
+def set_tex_mode(mode):
+    if mode == 'latex':
+        rc('text', usetex=True)
+        return
+    rc('text', usetex=False)
+    rc('mathtext', fontset='cm')
+    rc('font', family='serif', serif=['cmr10'] + matplotlib.rcParams['font.serif'], weight='normal')
+    # cmr10 has no minus sign, numbers are drawn as math
+    rc('axes.formatter', use_mathtext=True)
+
+def set_usetex(fig):
+    for text in fig.findobj(Text):
+        text.set_usetex(needs_latex(text.get_text()))
+
+# In auto mode, hands the texts of a figure that need LaTeX over to it.
+# Tick labels only exist once the figure is drawn, so this draws it first.
+def prepare_figure(fig, mode):
+    if mode != 'auto':
+        return
+    set_usetex(fig)
+    fig.draw_without_rendering()
+    set_usetex(fig)